@@ -76,6 +76,7 @@ arg_parser.add_argument('-minsize', dest = 'min_group_size', type = int, default
 arg_parser.add_argument('-maxsize', dest = 'max_group_size', type = int, default = 0, help = 'Maximal size (number of sequences) of a group (0=infinity)')
 arg_parser.add_argument('-c', dest = 'clean', action = 'store_true', default = False, help = 'Produce cleaned output TSV (without comments and averaged values)')
 arg_parser.add_argument('-preparse', dest = 'preparse_group_map', action = 'store_true', default = False, help = 'Preparse the group mapping before parsing the sequence length database')
+arg_parser.add_argument('-j', dest = 'jobs', type = int, default = 1, help = 'Number of processes calculating measures of the sequences in parallel (applicable only without output files other than the measures table)')
 arg_parser.add_argument('-w', dest = 'warnings', type = int, default = 1, help = 'Warnings level: 0 - no warnings, 1- standard')
 arg_processor = ArgumentProcessor(arg_parser)
 opt = arg_processor.prepare_input_options()
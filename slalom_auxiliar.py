@@ -1,7 +1,12 @@
-import os, sys, re, math, datetime, time
+import os, sys, re, math, datetime, functools, multiprocessing
 import numpy as np
 from operator import itemgetter
-from slalom_structures import DefaultOrderedDict, InputData, CurrentSequence, BasicBooleanMeasures, BasicEnrichmentMeasures, PerformanceMeasures, FileHandlers
+from itertools import repeat, chain
+from concurrent.futures import ProcessPoolExecutor
+from slalom_structures import DefaultOrderedDict, SiteArray, InputData, CurrentSequence, BasicBooleanMeasures, BasicEnrichmentMeasures, PerformanceMeasures, FileHandlers, LazyFile
+
+#Not-a-number value reported for the measures with a zero denominator
+_NAN = float('nan')
 
 def error(message):
     """Function for error reporting"""
@@ -9,17 +14,50 @@ def error(message):
     sys.stderr.flush()
     sys.exit(1)
 
+def aligned_zeros(length, dtype, alignment = 64):
+    """Function to allocate a zero-filled one-dimensional array with its data aligned to a given number of bytes, cache line by default"""
+    dtype = np.dtype(dtype)
+    buffer = np.zeros(length * dtype.itemsize + alignment, dtype = np.uint8)
+    offset = -buffer.ctypes.data % alignment
+    #The view keeps the underlying buffer alive
+    return buffer[offset: offset + length * dtype.itemsize].view(dtype)
+
+def count_coverage(begins, ends, length):
+    """Function to count for each symbol of a sequence the number of sites covering it, given the arrays of site begin and end symbol numbers"""
+    #Every site adds one at its begin and subtracts one right after its end, so the running sum gives the counts
+    deltas = np.bincount(begins - 1, minlength = length + 1) - np.bincount(ends, minlength = length + 1)
+    return np.cumsum(deltas[: -1])
+
+def count_in_sites(mask, begins, ends):
+    """Function to count the True values of a Boolean mask of sequence symbols within each site, given the arrays of site begin and end symbol numbers"""
+    #Differences of the running sum at the site bounds give the counts without slicing the mask per site
+    cumulative = np.concatenate(([0], np.cumsum(mask, dtype = np.int64)))
+    return cumulative[ends] - cumulative[begins - 1]
+
+def round_percentages(parts, totals):
+    """Function to calculate the percentages of parts in totals rounded to integers (halves to even, as by round) in integer arithmetic, element-wise for arrays"""
+    quotients, remainders = np.divmod(200 * parts + totals, 2 * totals)
+    return quotients - ((remainders == 0) & (quotients % 2 == 1))
+
+def find_runs(mask):
+    """Function to find the runs of True values in a Boolean mask as the arrays of their begin indices and end indices (exclusive)"""
+    changes = np.diff(np.concatenate(([0], mask.view('i1'), [0])))
+    return np.flatnonzero(changes == 1), np.flatnonzero(changes == -1)
+
 class ArgumentValidator:
     """Class that contain means to command line argument validation"""
     prefixes = {'s': 'len_db', 'm': 'group_map', 'a1': 'anno1', 'a2': 'anno2'}
     suffixes = {'d': 'delimiter', 'h': 'headers', 'c': 'columns', 'q': 'quotes'}
-    misc_keys = {'-ovs': 'overlap_symbols', '-ovp': 'overlap_part', '-n': 'enrichment_count', '-maxsize': 'max_group_size', '-w': 'warnings', '-l': 'seq_len'}
+    misc_keys = {'-ovs': 'overlap_symbols', '-ovp': 'overlap_part', '-n': 'enrichment_count', '-maxsize': 'max_group_size', '-w': 'warnings', '-l': 'seq_len', '-j': 'jobs'}
+    file_control_compiled = re.compile('-({})({})'.format('|'.join(prefixes), '|'.join(suffixes)))
+    #Regular expressions for lists of column numbers, by the expected number of columns
+    column_numbers_compiled = {n: re.compile(r'^([1-9]\d*,){{{}}}[1-9]\d*$'.format(n - 1)) for n in range(1, 6)}
+    delimiter_compiled = re.compile('''^[ \t,;.:/]$''')
     def __init__(self, opt):
         self.opt = opt
-        self.file_control_regex = '-({})({})'.format('|'.join(self.prefixes), '|'.join(self.suffixes))
     def _get_file_control_option_value(self, key):
         """Method to retrieve values of file control command line options by their keys"""
-        regex_search = re.search(self.file_control_regex, key)
+        regex_search = ArgumentValidator.file_control_compiled.search(key)
         if not regex_search:
             return None
         dest = '{}_{}'.format(self.prefixes[regex_search.group(1)], self.suffixes[regex_search.group(2)])
@@ -57,18 +95,16 @@ class ArgumentValidator:
                     n = 3 if ((not self.opt.group_map) or getattr(self.opt, 'anno' + key[2] + '_all_groups')) else 4
                 if self.opt.site_names:
                     n += 1
-            regex = '^([1-9]\d*,){{{}}}[1-9]\d*$'.format(n - 1)
-            if not re.search(regex, self._get_file_control_option_value(key)):
+            if not ArgumentValidator.column_numbers_compiled[n].search(self._get_file_control_option_value(key)):
                 if n > 1:
                     error("Invalid format for the option '{}'. Expected a list of {} comma-delimited positive integers".format(key, n))
                 else:
                     error("Invalid format for the option '{}'. Expected a positive integer".format(key))
     def validate_delimiters(self):
         """Method to check for validity the delimiters for the input files"""
-        regex = re.compile('''^[ \t,;.:/]$''')
         for key in ('-sd', '-md', '-a1d', '-a2d'):
             value = self._get_file_control_option_value(key)
-            if not regex.match(value):
+            if not ArgumentValidator.delimiter_compiled.match(value):
                 error("Invalid value for the option '{}'. Expected a character from the set ' \t,;.:/'".format(key))
     def validate_numerical_options_boundaries(self):
         """Method to check if numerical option values lie in correct boundaries"""
@@ -78,7 +114,7 @@ class ArgumentValidator:
         for key in ('-l', '-n', '-maxsize'):
             if getattr(self.opt, self.misc_keys[key]) < 0:
                 error("Invalid value for the option '{}'. Expected a non-negative integer".format(key))
-        for key in ('-ovs', ):
+        for key in ('-ovs', '-j'):
             if getattr(self.opt, self.misc_keys[key]) < 1:
                 error("Invalid value for the option '{}'. Expected a positive integer".format(key))
         for key in ('-ovp', ):
@@ -130,6 +166,11 @@ class ArgumentValidator:
             error('Named sites are not compatible with merging while resolving overlaps')
         if (self.opt.overlap_apply == 'patched') and (self.opt.site_difference == 'discrepant'):
             error('Showing only discreoant in the site-wise output is not compatible with the patched overlap logic')
+        if self.opt.jobs > 1:
+            if 'fork' not in multiprocessing.get_all_start_methods():
+                error('Parallel processing of the sequences is not supported on this platform')
+            if any(getattr(self.opt, 'output_file_' + type_) for type_ in FileHandlers.output_file_types) and self.opt.warnings:
+                print('Output files other than the measures table are requested. The sequences are processed in a single process')
 
 class ArgumentProcessor:
     """Class to coordinate command line argument parsing"""
@@ -154,56 +195,100 @@ class ArgumentProcessor:
         
 class CSVParser:
     """Class to parse the input CSV files"""
-    field_regex_quoted = '''((?:[^{0}"']|"[^"]*(?:"|$)|'[^']*(?:'|$))+|(?={0}{0})|(?={0}$)|(?=^{0}))'''
-    field_regex_simple = '(?:[^{0}]+|(?={0}{0})|(?={0}$)|(?=^{0}))'
-    quote_compiled = re.compile('''['"]''')
-    int_regex = re.compile('^[+-]?\d*$')
-    pos_int_regex = re.compile('^\+?[1-9]\d*$')
-    time_formats_compiled = [re.compile(x) for x in ('^\d\d/\d\d/\d{4} \d\d:\d\d:\d\d$', '^\d\d/\d\d/\d{4} \d\d:\d\d$', '^\d\d\.\d\d\.\d{4} \d\d:\d\d:\d\d$', '^\d\d\.\d\d\.\d{4} \d\d:\d\d$')]
-    time_formats = ['%m/%d/%Y %H:%M:%S', '%m/%d/%Y %H:%M', '%d.%m.%Y %H:%M:%S', '%d.%m.%Y %H:%M']
+    field_regex_quoted = r'''(?:(?:[^{0}"']|"[^"]*(?:"|$)|'[^']*(?:'|$))+|(?={0}{0})|(?={0}$)|(?=^{0}))'''
+    quote_compiled = re.compile(r'''['"]''')
+    int_regex = re.compile(r'^[+-]?\d*$')
+    pos_int_regex = re.compile(r'^\+?[1-9]\d*$')
+    time_parsers = (
+        lambda x: datetime.datetime(int(x[6: 10]), int(x[0: 2]), int(x[3: 5]), int(x[11: 13]), int(x[14: 16]), int(x[17: 19])),
+        lambda x: datetime.datetime(int(x[6: 10]), int(x[0: 2]), int(x[3: 5]), int(x[11: 13]), int(x[14: 16])),
+        lambda x: datetime.datetime(int(x[6: 10]), int(x[3: 5]), int(x[0: 2]), int(x[11: 13]), int(x[14: 16]), int(x[17: 19])),
+        lambda x: datetime.datetime(int(x[6: 10]), int(x[3: 5]), int(x[0: 2]), int(x[11: 13]), int(x[14: 16]))
+    )
     def __init__(self, opt, global_state):
         self.opt = opt
         self.global_state = global_state
         self.input_data = InputData()
+        self._GID_codes = {}
+        self._SID_codes = {}
+        #POSIX timestamps of the time strings already converted, as sites often share their begin or end time
+        self._timestamp_cache = {}
+        #Flat columns of GID codes, SID codes, begin positions, end positions and site names of the parsed sites for each annotation
+        self._site_columns = (None, ([], [], [], [], []), ([], [], [], [], []))
+        #Column chunks of the sites of records shared by all the sequences, expanded at once over the sequences for each annotation
+        self._site_chunks = (None, [], [])
+    @staticmethod
+    @functools.lru_cache(maxsize = 16)
+    def _field_re(delimiter):
+        """Method to get the compiled regular expression matching the possibly quoted fields of a line with a given delimiter"""
+        return re.compile(CSVParser.field_regex_quoted.format(delimiter))
+    @staticmethod
+    def _read_lines(ifile, chunk_size = 1 << 20):
+        """Method to read a text file in large chunks and yield its lines without line ends"""
+        tail = ''
+        while True:
+            chunk = ifile.read(chunk_size)
+            if not chunk:
+                break
+            lines = (tail + chunk).split('\n')
+            tail = lines.pop()
+            yield from lines
+        if tail:
+            yield tail
     def _parse_input_file(self, opt_prefix, preliminary = False):
         """Method to parse an input file"""
         column_indices = tuple(int(x) - 1 for x in getattr(self.opt, opt_prefix + '_columns').split(','))
         filename = getattr(self.opt, opt_prefix)
         delimiter = getattr(self.opt, opt_prefix + '_delimiter')
         quotes_as_escaped = getattr(self.opt, opt_prefix + '_quotes')
-        file_field = re.compile(getattr(CSVParser, 'field_regex_simple' if quotes_as_escaped else 'field_regex_quoted').format(delimiter))
+        get_columns = itemgetter(*column_indices)
+        #Splitting stops right after the last needed column, leaving the rest of the line unsplit
+        max_split = max(column_indices) + 1
+        save_record = self._get_record_saver(opt_prefix, preliminary)
+        field_findall = CSVParser._field_re(delimiter).findall
+        quote_sub = CSVParser.quote_compiled.sub
         with open(filename, 'r') as ifile:
+            lines = CSVParser._read_lines(ifile)
             for i in range(getattr(self.opt, opt_prefix + '_headers')):
-                next(ifile)
-            for line_idx, line in enumerate(ifile):
+                next(lines)
+            for line_idx, line in enumerate(lines):
+                #Lines are split in C; the regex is needed only to keep quoted delimiters within a field
+                unquoted = quotes_as_escaped or (('"' not in line) and ("'" not in line))
                 try:
-                    values = itemgetter(*column_indices)(file_field.findall(line.strip('\n')))
+                    values = get_columns(line.split(delimiter, max_split) if unquoted else field_findall(line))
                 except IndexError:
                     print('~{}~{}~{}~'.format(column_indices, line, quotes_as_escaped))##/
                     error('Error while parsing the line {} of the file "{}". Not enough columns delimited by "{}" identified'.format(line_idx + 1, filename, delimiter))
-                if not quotes_as_escaped:
-                    values = [CSVParser.quote_compiled.sub('', el) for el in values]
+                if not unquoted:
+                    values = [quote_sub('', el) for el in values]
                 try:
-                    self._save_record(opt_prefix, values, preliminary)
+                    save_record(values)
                 except RuntimeError as e:
                     error('Error while parsing the line {} of the file "{}". {}'.format(line_idx + 1, filename, str(e)))
     def _duration_in_units(self, start_time_point, finish_time_point):
-        """Method to calculate the distance in time, measured in speciied by the user units, between two points"""
-        return math.floor((time.mktime(finish_time_point) - time.mktime(start_time_point)) / self.global_state.time_unit_seconds)
-    def _convert_interval_to_time_structs(self, interval):
-        """Mathod to convert time strings in an interval to time_struct objects"""
+        """Method to calculate the distance in time, measured in speciied by the user units, between two POSIX timestamps"""
+        return (finish_time_point - start_time_point) // self.global_state.time_unit_seconds
+    @staticmethod
+    def _dispatch_time_format(time_str):
+        """Method to identify the format of a time string by its separators and length"""
+        length = len(time_str)
+        if (length in (16, 19)) and (time_str[2] in ('/', '.')) and (time_str[5] == time_str[2]) and (time_str[10] == ' ') and (time_str[13] == ':') and ((length == 16) or (time_str[16] == ':')):
+            if (time_str[0: 2] + time_str[3: 5] + time_str[6: 10] + time_str[11: 13] + time_str[14: 16] + time_str[17: ]).isdecimal():
+                return (0 if time_str[2] == '/' else 2) + (0 if length == 19 else 1)
+        raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"')
+    def _convert_interval_to_timestamps(self, interval):
+        """Mathod to convert time strings in an interval to POSIX timestamps in seconds"""
+        timestamp_cache = self._timestamp_cache
         for interval_idx, time_str in enumerate(interval):
-            recognized = False
-            for time_format_idx, time_format_compiled in enumerate(CSVParser.time_formats_compiled):
-                if time_format_compiled.search(time_str):
-                    recognized = True
-                    try:
-                        interval[interval_idx] = time.strptime(time_str, CSVParser.time_formats[time_format_idx])
-                    except ValueError:
-                        raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"') from None
-                    break
-            if not recognized:
-                raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"')
+            timestamp = timestamp_cache.get(time_str)
+            if timestamp is None:
+                time_parser = CSVParser.time_parsers[CSVParser._dispatch_time_format(time_str)]
+                try:
+                    timestamp = int(time_parser(time_str).timestamp())
+                except ValueError:
+                    raise RuntimeError('Time format was not recognized. Supported formats: "mm/dd/yyyy HH:MM[:SS]" and "dd.mm.yyyy HH:MM[:SS]"') from None
+                timestamp_cache[time_str] = timestamp
+            interval[interval_idx] = timestamp
     def _save_seq_len_db_record(self, values, not_first_to_check):
         """Method to save a sequence length database record"""
         def _save_record():
@@ -219,6 +304,7 @@ class CSVParser:
                 SID = ''
             else:
                 SID, seq_length = values
+                SID = sys.intern(SID)
             if not self.pos_int_regex.search(seq_length):
                 raise RuntimeError('Sequence length must be a positive integer')
         else:
@@ -227,14 +313,15 @@ class CSVParser:
                 SID = ''
             else:
                 SID, start, finish = values
+                SID = sys.intern(SID)
             interval = [start, finish]
-            self._convert_interval_to_time_structs(interval)
+            self._convert_interval_to_timestamps(interval)
             seq_length = self._duration_in_units(interval[0], interval[1])
             if seq_length < 1:
                 raise RuntimeError('The time interval must contain at least 1 time unit')
         seq_length = int(seq_length)
         if not_first_to_check:
-            if SID not in self.input_data.seq_len.keys():
+            if SID not in self.input_data.seq_len:
                 return
             if self.input_data.seq_len[SID] is None:
                 _save_record()
@@ -250,7 +337,8 @@ class CSVParser:
             raise RuntimeError('Inconsistency in the sequence length database. Different start values for a duplicating SID.')
     def _save_group_map_record(self, values, preliminary = False):
         """Method to save a group mapping record"""
-        SID, GID = values
+        SID = sys.intern(values[0])
+        GID = sys.intern(values[1])
         if not GID:
             raise RuntimeError('A GID cannot be empty')
         if '"' in GID:
@@ -259,134 +347,239 @@ class CSVParser:
             self.input_data.seq_len[SID] = self.auto_seq_len
             if self.global_state.time_unit_seconds:
                 self.input_data.time_series_starts[SID] = self.auto_series_start
-        elif SID not in self.input_data.seq_len.keys():
+        elif SID not in self.input_data.seq_len:
             if self.opt.warnings:
                 print('Warning: SID "{}" is not the sequence length database. The group mapping record is ignored'.format(SID))
             return
         if SID not in self.input_data.group_map[GID]:
             self.input_data.group_map[GID].append(SID)
-    def _save_annotation_record(self, opt_prefix, values):
-        """Method to save an annotation record"""
-        if self.opt.site_names:
-            site_name = values[-1]
-            if not site_name:
-                raise RuntimeError('A site name cannot be empty')
-            if '"' in site_name:
-                raise RuntimeError('A site name cannot contain double quotes')
-            values = values[: -1]
-        if self.opt.single_sequence or getattr(self.opt, opt_prefix + '_all_sequences'):
-            begin, end = values
-            GID = ''
-            SID = ''
-        elif self.opt.group_map and (not getattr(self.opt, opt_prefix + '_all_groups')):
-            begin, end, SID, GID = values
-        else:
-            begin, end, SID = values
-            GID = ''
-        GID_list = [GID] if GID else list(self.input_data.group_map.keys())
-        for GID_ in GID_list:
-            SID_list = [SID] if SID else self.input_data.group_map[GID_]
-            for SID_ in SID_list:
-                if SID_ not in self.input_data.seq_len.keys():
-                    if (not self.opt.len_db) and (not self.opt.group_map):
-                        self.input_data.group_map[GID_].append(SID_)
-                        self.input_data.seq_len[SID_] = self.auto_seq_len
-                        if self.global_state.time_unit_seconds:
-                            self.input_data.time_series_starts[SID_] = self.auto_series_start
-                    elif self.opt.warnings:
-                        print('Warning: SID "{}" is not in the sequence length database. The annotation record is ignored'.format(SID_))
-                        return
-                if GID_ not in self.input_data.group_map.keys():
-                    if self.opt.warnings:
-                        print('Warning: GID "{}" is not in the group mapping. The annotation record is ignored'.format(GID_))
+    def _get_annotation_record_saver(self, opt_prefix):
+        """Method to build the function saving an annotation record, with the relevant options resolved once per file"""
+        site_names = self.opt.site_names
+        all_sequences = self.opt.single_sequence or getattr(self.opt, opt_prefix + '_all_sequences')
+        all_groups = getattr(self.opt, opt_prefix + '_all_groups')
+        read_GIDs = self.opt.group_map and (not all_groups)
+        auto_sequences = (not self.opt.len_db) and (not self.opt.group_map)
+        warnings = self.opt.warnings
+        time_unit_seconds = self.global_state.time_unit_seconds
+        begin_shift = getattr(self.opt, opt_prefix + '_begin_shift')
+        end_shift = getattr(self.opt, opt_prefix + '_end_shift')
+        end_overflow_policy = self.opt.end_overflow_policy
+        int_regex_search = self.int_regex.search
+        intern = sys.intern
+        seq_len = self.input_data.seq_len
+        seq_len_has = seq_len.__contains__
+        group_map = self.input_data.group_map
+        group_map_has = group_map.__contains__
+        time_series_starts = self.input_data.time_series_starts
+        GID_codes = self._GID_codes
+        SID_codes = self._SID_codes
+        GID_column, SID_column, begin_column, end_column, name_column = self._site_columns[int(opt_prefix[-1])]
+        site_chunks = self._site_chunks[int(opt_prefix[-1])]
+        if all_sequences:
+            target_GIDs = []
+            target_SIDs = []
+            for GID_, SID_list in group_map.items():
+                target_GIDs.extend([GID_] * len(SID_list))
+                target_SIDs.extend(SID_list)
+            target_GID_codes = np.array([GID_codes.setdefault(GID_, len(GID_codes)) for GID_ in target_GIDs], dtype = np.int64)
+            target_SID_codes = np.array([SID_codes.setdefault(SID_, len(SID_codes)) for SID_ in target_SIDs], dtype = np.int64)
+            target_lengths = np.array([seq_len[SID_] for SID_ in target_SIDs], dtype = np.int64)
+            if time_unit_seconds:
+                target_starts = np.array([time_series_starts[SID_] for SID_ in target_SIDs], dtype = np.int64)
+        elif all_groups:
+            SID_groups = {}
+            for GID_, SID_list in group_map.items():
+                for SID_ in SID_list:
+                    SID_groups.setdefault(SID_, []).append(GID_)
+        def _save_shared_record(begin, end, site_name):
+            """Closure to save an annotation record shared by all the sequences, with the positions computed for all the sequences at once"""
+            if not time_unit_seconds:
+                if (not int_regex_search(begin)) and (not int_regex_search(end)):
+                    raise RuntimeError('Site begin and end position must be integers')
+                begins = np.full(len(target_SIDs), int(begin), dtype = np.int64)
+                ends = np.full(len(target_SIDs), int(end), dtype = np.int64)
+            else:
+                interval = [begin, end]
+                self._convert_interval_to_timestamps(interval)
+                begins = (interval[0] - target_starts) // time_unit_seconds + 1
+                ends = (interval[1] - target_starts) // time_unit_seconds
+            begins += begin_shift
+            ends += end_shift
+            keep = np.ones(len(target_SIDs), dtype = bool)
+            underflow = begins < 1
+            if underflow.any():
+                if end_overflow_policy == 'error':
+                    raise RuntimeError('Site begin position must be positive')
+                elif end_overflow_policy == 'trim':
+                    keep &= ends >= 1
+                    begins[underflow] = 1
+                elif end_overflow_policy == 'ignore':
+                    keep &= ~underflow
+            if (begins[keep] > ends[keep]).any():
+                raise RuntimeError('Site begin position cannot exceed the end position')
+            overflow = ends > target_lengths
+            if overflow.any():
+                if end_overflow_policy == 'error':
+                    raise RuntimeError('Site end position cannot exceed the sequence length')
+                elif end_overflow_policy == 'trim':
+                    np.minimum(ends, target_lengths, out = ends)
+                    keep &= begins <= ends
+                elif end_overflow_policy == 'ignore':
+                    keep &= ~overflow
+            site_chunks.append((target_GID_codes[keep], target_SID_codes[keep], begins[keep], ends[keep], np.full(np.count_nonzero(keep), site_name, dtype = object) if site_names else None))
+        def _save_annotation_record(values):
+            """Closure to save an annotation record"""
+            if site_names:
+                site_name = values[-1]
+                if not site_name:
+                    raise RuntimeError('A site name cannot be empty')
+                if '"' in site_name:
+                    raise RuntimeError('A site name cannot contain double quotes')
+                values = values[: -1]
+            if all_sequences:
+                begin, end = values
+                _save_shared_record(begin, end, site_name if site_names else None)
+                return
+            elif read_GIDs:
+                begin, end, SID, GID = values
+                SID = intern(SID)
+                GID = intern(GID)
+            else:
+                begin, end, SID = values
+                SID = intern(SID)
+                GID = ''
+            if GID:
+                GID_list = [GID]
+            elif all_groups:
+                if not seq_len_has(SID):
+                    if warnings:
+                        print('Warning: SID "{}" is not in the sequence length database. The annotation record is ignored'.format(SID))
                     return
-                if SID_ not in self.input_data.group_map[GID_]:
-                    if getattr(self.opt, opt_prefix + '_all_groups'):
-                        continue
-                    raise RuntimeError('SID "{}" does not belong to the group "{}" in the group mapping'.format(SID_, GID_))
-                if not self.global_state.time_unit_seconds:
-                    if (not self.int_regex.search(begin)) and (not self.int_regex.search(end)):
-                        raise RuntimeError('Site begin and end position must be integers')
-                    begin_ = int(begin)
-                    end_ = int(end)
-                else:
-                    interval = [begin, end]
-                    self._convert_interval_to_time_structs(interval)
-                    begin_ = self._duration_in_units(self.input_data.time_series_starts[SID_], interval[0]) + 1
-                    end_ = self._duration_in_units(self.input_data.time_series_starts[SID_], interval[1])
-                begin_ += getattr(self.opt, opt_prefix + '_begin_shift')
-                end_ += getattr(self.opt, opt_prefix + '_end_shift')
-                if begin_ < 1:
-                    if self.opt.end_overflow_policy == 'error':
-                        raise RuntimeError('Site begin position must be positive')
-                    elif self.opt.end_overflow_policy == 'trim':
-                        if end_ < 1:
+                GID_list = SID_groups.get(SID, [])
+            else:
+                GID_list = list(group_map.keys())
+            for GID_ in GID_list:
+                SID_list = [SID] if SID else group_map[GID_]
+                for SID_ in SID_list:
+                    if not seq_len_has(SID_):
+                        if auto_sequences:
+                            group_map[GID_].append(SID_)
+                            seq_len[SID_] = self.auto_seq_len
+                            if time_unit_seconds:
+                                time_series_starts[SID_] = self.auto_series_start
+                        elif warnings:
+                            print('Warning: SID "{}" is not in the sequence length database. The annotation record is ignored'.format(SID_))
                             return
-                        begin_ = 1
-                    elif self.opt.end_overflow_policy == 'ignore':
+                    if not group_map_has(GID_):
+                        if warnings:
+                            print('Warning: GID "{}" is not in the group mapping. The annotation record is ignored'.format(GID_))
                         return
-                if begin_ > end_:
-                    raise RuntimeError('Site begin position cannot exceed the end position')
-                if end_ > self.input_data.seq_len[SID_]:
-                    if self.opt.end_overflow_policy == 'error':
-                        raise RuntimeError('Site end position cannot exceed the sequence length')
-                    elif self.opt.end_overflow_policy == 'trim':
-                        end_ = self.input_data.seq_len[SID_]
-                        if begin_ > end_:
+                    if SID_ not in group_map[GID_]:
+                        if all_groups:
+                            continue
+                        raise RuntimeError('SID "{}" does not belong to the group "{}" in the group mapping'.format(SID_, GID_))
+                    if not time_unit_seconds:
+                        if (not int_regex_search(begin)) and (not int_regex_search(end)):
+                            raise RuntimeError('Site begin and end position must be integers')
+                        begin_ = int(begin)
+                        end_ = int(end)
+                    else:
+                        interval = [begin, end]
+                        self._convert_interval_to_timestamps(interval)
+                        begin_ = self._duration_in_units(time_series_starts[SID_], interval[0]) + 1
+                        end_ = self._duration_in_units(time_series_starts[SID_], interval[1])
+                    begin_ += begin_shift
+                    end_ += end_shift
+                    if begin_ < 1:
+                        if end_overflow_policy == 'error':
+                            raise RuntimeError('Site begin position must be positive')
+                        elif end_overflow_policy == 'trim':
+                            if end_ < 1:
+                                return
+                            begin_ = 1
+                        elif end_overflow_policy == 'ignore':
                             return
-                    elif self.opt.end_overflow_policy == 'ignore':
-                        return
-                no = int(opt_prefix[-1])
-                self.input_data.sites[no][GID_][SID_].append([begin_, end_])
-                if self.opt.site_names:
-                    self.input_data.sites[no][GID_][SID_][-1].append(site_name)
-    def _save_record(self, opt_prefix, values, preliminary = False):
-        """Method to save a record from an input file"""
+                    if begin_ > end_:
+                        raise RuntimeError('Site begin position cannot exceed the end position')
+                    if end_ > seq_len[SID_]:
+                        if end_overflow_policy == 'error':
+                            raise RuntimeError('Site end position cannot exceed the sequence length')
+                        elif end_overflow_policy == 'trim':
+                            end_ = seq_len[SID_]
+                            if begin_ > end_:
+                                return
+                        elif end_overflow_policy == 'ignore':
+                            return
+                    GID_column.append(GID_codes.setdefault(GID_, len(GID_codes)))
+                    SID_column.append(SID_codes.setdefault(SID_, len(SID_codes)))
+                    begin_column.append(begin_)
+                    end_column.append(end_)
+                    if site_names:
+                        name_column.append(site_name)
+        return _save_annotation_record
+    def _get_record_saver(self, opt_prefix, preliminary = False):
+        """Method to get the function saving a record from an input file"""
         if opt_prefix == 'len_db':
-            self._save_seq_len_db_record(values, self.opt.preparse_group_map)
+            return functools.partial(self._save_seq_len_db_record, not_first_to_check = self.opt.preparse_group_map)
         elif opt_prefix == 'group_map':
-            self._save_group_map_record(values, preliminary)
-        elif opt_prefix in ('anno1', 'anno2'):   
-            self._save_annotation_record(opt_prefix, values)
-    def _sort_annotations(self):
-        """Method to sort the annotated sites for every sequence by begin symbol number"""
-        for i in (1, 2):
-            for group in self.input_data.sites[i].values():
-                for sites in group.values():
-                    sites.sort(key = lambda x: x[0])
-    def _resolve_overlaps_within_annotations(self):
-        """Method to resolve groups of overlapping sites within a given annotation according to the user-defined policy"""
+            return functools.partial(self._save_group_map_record, preliminary = preliminary)
+        elif opt_prefix in ('anno1', 'anno2'):
+            return self._get_annotation_record_saver(opt_prefix)
+    def _build_site_arrays(self):
+        """Method to group the site columns collected while parsing the annotations into site arrays for every sequence, sorted by begin symbol number and with overlaps resolved according to the user-defined policy"""
+        GIDs = list(self._GID_codes)
+        SIDs = list(self._SID_codes)
         for i in (1, 2):
-            policy = getattr(self.opt, 'anno{}_resolve_overlaps'.format(i))
-            if policy == 'all':
+            GID_column, SID_column, begin_column, end_column, name_column = self._site_columns[i]
+            chunks = self._site_chunks[i]
+            if (not begin_column) and (not chunks):
                 continue
-            for group in self.input_data.sites[i].values():
-                for sites in group.values():
-                    sites_new = []
-                    if policy == 'first':
-                        last_end = 0
-                        for site in sites:
-                            if site[0] > last_end:
-                                sites_new.append(site)
-                            last_end = site[1]
-                    elif policy == 'last':
-                        next_begin = float('inf')
-                        for site in reversed(sites):
-                            if site[1] < next_begin:
-                                sites_new.insert(0, site)
-                            next_begin = site[0]
-                    elif policy == 'merge':
-                        last_end = 0
-                        new_begin = 0
-                        for site in sites:
-                            if site[0] > last_end:
-                                if new_begin > 0:
-                                    sites_new.append([new_begin, last_end])
-                                new_begin = site[0]
-                            last_end = site[1]
-                        if new_begin > 0:
-                            sites_new.append([new_begin, last_end])
-                    sites[: ] = sites_new       
+            GID_codes = np.concatenate([np.fromiter(GID_column, dtype = np.int64, count = len(GID_column))] + [chunk[0] for chunk in chunks])
+            SID_codes = np.concatenate([np.fromiter(SID_column, dtype = np.int64, count = len(SID_column))] + [chunk[1] for chunk in chunks])
+            begins = np.concatenate([np.fromiter(begin_column, dtype = np.int64, count = len(begin_column))] + [chunk[2] for chunk in chunks])
+            ends = np.concatenate([np.fromiter(end_column, dtype = np.int64, count = len(end_column))] + [chunk[3] for chunk in chunks])
+            #The shared records may have lost all their sites to the end overflow policy
+            if len(begins) == 0:
+                continue
+            order = np.lexsort((begins, SID_codes, GID_codes))
+            GID_codes = GID_codes[order]
+            SID_codes = SID_codes[order]
+            begins = begins[order]
+            ends = ends[order]
+            names = np.concatenate([np.array(name_column, dtype = object)] + [chunk[4] for chunk in chunks])[order] if self.opt.site_names else None
+            sequence_starts = np.empty(len(order), dtype = bool)
+            sequence_starts[0] = True
+            sequence_starts[1: ] = (GID_codes[1: ] != GID_codes[: -1]) | (SID_codes[1: ] != SID_codes[: -1])
+            policy = getattr(self.opt, 'anno{}_resolve_overlaps'.format(i))
+            if policy != 'all':
+                #Overlaps are resolved on the sorted columns of all the sequences at once, taking care not to cross sequence boundaries
+                if policy == 'last':
+                    keep = np.empty(len(order), dtype = bool)
+                    keep[: -1] = (ends[: -1] < begins[1: ]) | sequence_starts[1: ]
+                    keep[-1] = True
+                else:
+                    #A site starts a new group of overlapping sites if it begins after all the preceding sites of its sequence have ended.
+                    #Shifting the ends of every next sequence above those of the previous ones makes the running maximum restart at each sequence
+                    shifts = (np.cumsum(sequence_starts) - 1) * (int(ends.max()) + 1)
+                    running_ends = np.maximum.accumulate(ends + shifts) - shifts
+                    keep = sequence_starts.copy()
+                    keep[1: ] |= begins[1: ] > running_ends[: -1]
+                    if policy == 'merge':
+                        #Every site takes the maximal end of its group, which is kept for the group's first site
+                        ends = np.maximum.reduceat(ends, np.flatnonzero(keep))[np.cumsum(keep) - 1]
+                GID_codes = GID_codes[keep]
+                SID_codes = SID_codes[keep]
+                begins = begins[keep]
+                ends = ends[keep]
+                names = names[keep] if names is not None else None
+            bounds = np.concatenate(([0], np.flatnonzero((GID_codes[1: ] != GID_codes[: -1]) | (SID_codes[1: ] != SID_codes[: -1])) + 1, [len(begins)])).tolist()
+            for first, last in zip(bounds[: -1], bounds[1: ]):
+                site_names = names[first: last] if names is not None else None
+                self.input_data.sites[i][GIDs[GID_codes[first]]][SIDs[SID_codes[first]]] = SiteArray(begins[first: last], ends[first: last], site_names)
+            for column in self._site_columns[i]:
+                column.clear()
+            chunks.clear()
     def calc_and_set_auto_seq_len(self):
         """Method to calculate the sequence length and, if applicable, the start of time series, on the basis of the input parameters  if the database is not provided"""
         if self.opt.len_db:
@@ -397,7 +590,7 @@ class CSVParser:
             else:
                 interval = [self.opt.series_start, self.opt.series_finish]
                 try:
-                    self._convert_interval_to_time_structs(interval)
+                    self._convert_interval_to_timestamps(interval)
                 except RuntimeError as e:
                     raise RuntimeError('Time series start and end: ' + e.args[0]) from None
                 self.auto_seq_len = self._duration_in_units(interval[0], interval[1])
@@ -439,10 +632,9 @@ class CSVParser:
         print('The first annotation has been read from "{}"'.format(getattr(self.opt, 'anno1')))
         self._parse_input_file('anno2')
         print('The second annotation has been read from "{}"'.format(getattr(self.opt, 'anno2')))
+        self._build_site_arrays()
         if (not self.input_data.sites[1]) or (not self.input_data.sites[2]):
             error('An annotation must not be empty')
-        self._sort_annotations()
-        self._resolve_overlaps_within_annotations()
     def get_data(self):
         return self.input_data
 
@@ -469,28 +661,40 @@ class BasicSequenceCalculator:
         self.opt = opt
         self.current_seq = current_seq
         self.results = None
-    def _in_union(self, idx):
-        """Method to check if given symbol is in the annotation union"""
+        #Boolean masks of the sequence symbols computed so far, by type
+        self._mask_cache = {}
+    def _in_union(self):
+        """Method to get the Boolean mask of the symbols in the annotation union"""
         raise NotImplementedError("Method '_in_union' is not implemented")
-    def _in_intersection(self, idx):
-        """Method to check if given symbol is in the annotation intersection"""
+    def _in_intersection(self):
+        """Method to get the Boolean mask of the symbols in the annotation intersection"""
         raise NotImplementedError("Method '_in_intersection' is not implemented")
-    def _in_complement1(self, idx):
-        """Method to check if given symbol is in the annotation complement of the first"""
+    def _in_complement1(self):
+        """Method to get the Boolean mask of the symbols in the annotation complement of the first"""
         raise NotImplementedError("Method '_in_complement1' is not implemented")
-    def _in_complement2(self, idx):
-        """Method to check if given symbol is in the annotation complement of the second"""
+    def _in_complement2(self):
+        """Method to get the Boolean mask of the symbols in the annotation complement of the second"""
         raise NotImplementedError("Method '_in_complement2' is not implemented")
-    def _in_re1(self, idx):
-        """Method to check if given symbol is in the annotation of relative enrichment for the first annotation"""
+    def _in_re1(self):
+        """Method to get the Boolean mask of the symbols in the annotation of relative enrichment for the first annotation"""
         raise NotImplementedError("Method '_in_re1' is not implemented")
-    def _in_re2(self, idx):
-        """Method to check if given symbol is in the annotation of relative enrichment for the first annotation"""
+    def _in_re2(self):
+        """Method to get the Boolean mask of the symbols in the annotation of relative enrichment for the first annotation"""
         raise NotImplementedError("Method '_in_re2' is not implemented")
-    def _write_site(self, file_handler, begin_idx, idx):
-        """Auxiliary method to write a site to an output annotation file"""
-        group = (self.current_seq.GID + '\t' if self.current_seq.GID else '')
-        file_handler.write('{}{}\t{}\t{}\n'.format(group, self.current_seq.SID, begin_idx + 1, idx))
+    def _mask_for(self, type_):
+        """Method to get the Boolean mask of the symbols of a given type, computing it only once per sequence"""
+        mask = self._mask_cache.get(type_)
+        if mask is None:
+            mask = self._mask_cache[type_] = getattr(self, '_in_' + type_)()
+        return mask
+    def _count_site_coverage(self, annotation_idx):
+        """Method to count for each symbol in the sequence the number of sites of an annotation covering it"""
+        sites = self.current_seq.sites[annotation_idx]
+        return count_coverage(sites.begins, sites.ends, self.current_seq.length)
+    def _write_sites(self, file_handler, begin_idxs, idxs):
+        """Auxiliary method to write sites to an output annotation file in a single call"""
+        prefix = (self.current_seq.GID + '\t' if self.current_seq.GID else '') + self.current_seq.SID + '\t'
+        file_handler.write(''.join(['{}{}\t{}\n'.format(prefix, begin_idx + 1, idx) for begin_idx, idx in zip(begin_idxs, idxs)]))
     def write_to_files(self, file_handlers):
         """Method to write the required output annotations"""
         for type_ in FileHandlers.output_file_types:
@@ -500,18 +704,9 @@ class BasicSequenceCalculator:
             if type_ in ('detailed', 'site'):
                 continue
             else:
-                in_site = False
-                begin_idx = None
-                for idx in range(self.current_seq.length):
-                    if getattr(self, '_in_' + type_)(idx):
-                        if not in_site:
-                            in_site = True
-                            begin_idx = idx
-                    elif in_site:
-                        self._write_site(file_handler, begin_idx, idx)
-                        in_site = False
-                if in_site:
-                    self._write_site(file_handler, begin_idx, self.current_seq.length)
+                begin_idxs, idxs = find_runs(self._mask_for(type_))
+                if len(begin_idxs):
+                    self._write_sites(file_handler, begin_idxs.tolist(), idxs.tolist())
     def calculate_residue_wise(self):
         """Method to calculate residue-wise measures for a given sequence"""
         raise NotImplementedError("Method 'calculate_residue_wise' is not implemented")
@@ -522,190 +717,226 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
     """Class for calculating basic Boolean measures and write into files required output annotations in a particular sequence"""
     def __init__(self, global_state, opt, current_seq):
         BasicSequenceCalculator.__init__(self, global_state, opt, current_seq)
-        self.seq = np.zeros(shape = current_seq.length, dtype = 'i1')
+        self.seq = aligned_zeros(current_seq.length, 'i1')
         self.results = BasicBooleanMeasures()
+        #Numbers of the symbols present in both annotations within each site, by annotation
+        self._matched_symbols = [None, None, None]
+        #The overlap settings are fixed for the run, so the matching methods are selected once
+        self._min_overlap_symbols = opt.overlap_symbols
+        self._min_overlap_part = opt.overlap_part
+        self._get_site_length = {'shortest': self._get_shortest_site_length, 'longest': self._get_longest_site_length, 'current': self._get_current_site_length, 'patched': self._get_current_site_length}.get(opt.overlap_apply)
+        if opt.overlap_part <= 0:
+            self._check_overlap_sufficiency = self._check_overlap_symbols
         self._classify_symbols()
     def _classify_symbols(self):
         """Method to classify symbols in the sequence by their occurrence in the annotations"""
-        for site in self.current_seq.sites[1]:
-            for idx in range(site[0] - 1, site[1]):
-                self.seq[idx] = 1
-        for site in self.current_seq.sites[2]:
-            for idx in range(site[0] - 1, site[1]):
-                if self.seq[idx] == 0:
-                    self.seq[idx] = 2
-                elif self.seq[idx] == 1:
-                    self.seq[idx] = 3
-    def _in_union(self, idx):
-        """Method to check if given symbol is in the Bollean annotation union"""
-        return True if self.seq[idx] >= 1 else False
-    def _in_intersection(self, idx):
-        """Method to check if given symbol is in the Bollean annotation intersection"""
-        return True if self.seq[idx] == 3 else False
-    def _in_complement1(self, idx):
-        """Method to check if given symbol is in the Bollean annotation complement of the first"""
-        return True if self.seq[idx] == 2 else False
-    def _in_complement2(self, idx):
-        """Method to check if given symbol is in the Bollean annotation complement of the second"""
-        return True if self.seq[idx] == 1 else False
-    def _get_overlapped_symbols(self, site, site_, annotation_idx):
-        """Method to calculate number of shared symbols between two sites in the same sequence"""
+        #The first bit of a symbol code stands for the occurrence in the first annotation, the second bit - in the second one
+        for i in (1, 2):
+            self.seq |= (self._count_site_coverage(i) > 0).view('i1') << (i - 1)
+    def _in_union(self):
+        """Method to get the Boolean mask of the symbols in the Bollean annotation union"""
+        return self.seq >= 1
+    def _in_intersection(self):
+        """Method to get the Boolean mask of the symbols in the Bollean annotation intersection"""
+        return self.seq == 3
+    def _in_complement1(self):
+        """Method to get the Boolean mask of the symbols in the Bollean annotation complement of the first"""
+        return self.seq == 2
+    def _in_complement2(self):
+        """Method to get the Boolean mask of the symbols in the Bollean annotation complement of the second"""
+        return self.seq == 1
+    def _count_matched_symbols(self, annotation_idx):
+        """Method to count for each site of an annotation the symbols present in both annotations, computing the counts only once per sequence"""
+        if self._matched_symbols[annotation_idx] is None:
+            sites = self.current_seq.sites[annotation_idx]
+            self._matched_symbols[annotation_idx] = count_in_sites(self._mask_for('intersection'), sites.begins, sites.ends)
+        return self._matched_symbols[annotation_idx]
+    def _get_overlapped_symbols(self, begins, ends, begins_, ends_, annotation_idx):
+        """Method to calculate numbers of shared symbols between pairs of sites in the same sequence, given as arrays of begins and ends"""
+        overlapped_symbols = np.maximum(np.minimum(np.minimum(ends - begins_, ends_ - begins), np.minimum(ends - begins, ends_ - begins_)) + 1, 0)
         if self.opt.predictor_nature != 'neutral':
             if (self.opt.predictor_nature == 'lagging') == (annotation_idx == 1):
-                if site_[0] < site[0]:
-                    return 0
-            elif site_[0] > site[0]:
-                return 0
-        return max(min(site[1] - site_[0], site_[1] - site[0], site[1] - site[0], site_[1] - site_[0]) + 1, 0)
-    def _get_site_length(self, site, site_):
-        """Method to calculate the effective site length according to the input settings"""
-        if self.opt.overlap_apply == 'shortest':
-            return min(site[1] - site[0], site_[1] - site_[0]) + 1
-        elif self.opt.overlap_apply == 'longest':
-            return max(site[1] - site[0], site_[1] - site_[0]) + 1
-        elif self.opt.overlap_apply in ('current', 'patched'):
-            return site[1] - site[0] + 1
+                overlapped_symbols[begins_ < begins] = 0
+            else:
+                overlapped_symbols[begins_ > begins] = 0
+        return overlapped_symbols
+    def _get_shortest_site_length(self, begins, ends, begins_, ends_):
+        """Method to calculate the effective site lengths for pairs of sites as the length of the shortest site"""
+        return np.minimum(ends - begins, ends_ - begins_) + 1
+    def _get_longest_site_length(self, begins, ends, begins_, ends_):
+        """Method to calculate the effective site lengths for pairs of sites as the length of the longest site"""
+        return np.maximum(ends - begins, ends_ - begins_) + 1
+    def _get_current_site_length(self, begins, ends, begins_, ends_):
+        """Method to calculate the effective site lengths for pairs of sites as the length of the current site"""
+        return ends - begins + 1
     def _check_overlap_sufficiency(self, overlapped_symbols, site_length):
-        """Method to check if a goven overlap between sites satisfies the input overlap criteria"""
-        return (overlapped_symbols >= self.opt.overlap_symbols) and (overlapped_symbols / site_length >= self.opt.overlap_part)
-    def _write_measure_info_to_detailed_file(self, type_, description, detailed_file_h):
+        """Method to check if a goven overlap between sites satisfies the input overlap criteria, element-wise for arrays"""
+        return (overlapped_symbols >= self._min_overlap_symbols) & (overlapped_symbols / site_length >= self._min_overlap_part)
+    def _check_overlap_symbols(self, overlapped_symbols, site_length):
+        """Method to check if a goven overlap between sites satisfies the input overlap criteria when no minimal overlapping part is set"""
+        return overlapped_symbols >= self._min_overlap_symbols
+    def _write_measure_info_to_detailed_file(self, type_, symbols_n, description, detailed_file_h):
         """Writing the information on sybol counts in a specific category"""
-        symbols_n = getattr(self.results, type_)
         category_name = getattr(self.global_state, type_ + '_name')
         ending = '{} is' if symbols_n == 1 else 's{} are'
         ending = ending.format(' gross' if (self.opt.gross and (type_ != 'aa')) else '')
         detailed_file_h.write('{}{} symbol{} {}{}'.format(self.global_state.indent_site, symbols_n, ending, description, category_name) + os.linesep)
     def calculate_residue_wise(self, detailed_file_h):
         """Method to calculate Boolean residue-wise measures for a given sequence and write the information to the detailed output file"""
+        #Numbers of the symbols with each of the codes 0 to 3, counted in a single pass over the sequence
+        symbol_counts = np.bincount(self.seq, minlength = 4)
         if self.opt.gross:
-            self.results.pa = 0
-            self.results.ap = 0
+            unmatched_symbols_n = [None, 0, 0]
             for i in (1, 2):
                 j = 3 - i
-                for site in self.current_seq.sites[i]:
-                    matched_symbols_n = np.sum(self.seq[site[0] - 1: site[1]] == 3)
-                    site_length = site[1] - site[0] + 1
-                    unmatched_symbols_n = site_length - matched_symbols_n
-                    self.results.pp_[i] += matched_symbols_n
-                    attr_name = 'pa' if i == 1 else 'ap'
-                    setattr(self.results, attr_name, getattr(self.results, attr_name) + unmatched_symbols_n)
+                sites = self.current_seq.sites[i]
+                matched_symbols_n = int(np.sum(self._count_matched_symbols(i)))
+                unmatched_symbols_n[i] = int(np.sum(sites.ends - sites.begins + 1)) - matched_symbols_n
+                self.results.pp_[i] += matched_symbols_n
                 if detailed_file_h:
-                    ending = ('' if self.results.pp_[i] == 1 else 's') + ' gross'
+                    ending = ('' if matched_symbols_n == 1 else 's') + ' gross'
                     message = '{}{} symbol{} present in the {} are also present in the {}'
-                    detailed_file_h.write(message.format(self.global_state.indent_site, self.results.pp_[i], ending, self.global_state.anno_name[i], self.global_state.anno_name[j]) + os.linesep)
+                    detailed_file_h.write(message.format(self.global_state.indent_site, matched_symbols_n, ending, self.global_state.anno_name[i], self.global_state.anno_name[j]) + os.linesep)
+            pa, ap = unmatched_symbols_n[1: ]
         else:
-            self.results.pp = np.sum(self.seq == 3)
-            self.results.pp_[1] = self.results.pp
-            self.results.pp_[2] = self.results.pp
+            pp = symbol_counts[3]
+            self.results.pp = pp
+            self.results.pp_[1] = pp
+            self.results.pp_[2] = pp
             if detailed_file_h:
-                self._write_measure_info_to_detailed_file('pp', 'present in both annotations', detailed_file_h)
-            self.results.pa = np.sum(self.seq == 1)
-            self.results.ap = np.sum(self.seq == 2)
-        self.results.aa = np.sum(self.seq == 0)
+                self._write_measure_info_to_detailed_file('pp', pp, 'present in both annotations', detailed_file_h)
+            pa, ap = symbol_counts[1], symbol_counts[2]
+        self.results.pa = pa
+        self.results.ap = ap
+        self.results.aa = symbol_counts[0]
         if detailed_file_h:
             description = 'present exclusively in the ' + self.global_state.anno_name[1]
-            self._write_measure_info_to_detailed_file('pa', description, detailed_file_h)
+            self._write_measure_info_to_detailed_file('pa', pa, description, detailed_file_h)
             description = 'present exclusively in the ' + self.global_state.anno_name[2]
-            self._write_measure_info_to_detailed_file('ap', description, detailed_file_h)
-            self._write_measure_info_to_detailed_file('aa', 'absent in both annotations', detailed_file_h)
+            self._write_measure_info_to_detailed_file('ap', ap, description, detailed_file_h)
+            self._write_measure_info_to_detailed_file('aa', symbol_counts[0], 'absent in both annotations', detailed_file_h)
     def calculate_site_wise(self, detailed_file_h, site_file_h):
         """Method to calculate site-wise measures and write the site-wise information to the detailed output file"""
+        #Lines of the detailed and the site-wise output files, each written at once
+        detailed_lines = []
+        site_lines = []
         if self.opt.overlap_apply in ('shortest', 'longest', 'current'):
+            sites = self.current_seq.sites
+            #Sites of the other annotation that end before a site begins cannot overlap with it and are skipped, unless a zero overlap is sufficient
+            skip_preceding = not self._check_overlap_sufficiency(0, 1)
             for i in (1, 2):
                 j = 3 - i
-                last_end = 0
-                for site in self.current_seq.sites[i]:
-                    site_effective_begin = site[0] if self.opt.gross else max(site[0], last_end + 1)
-                    self.results.site_len[i] += site[1] - site_effective_begin + 1
-                    last_end = site[1]
-                    found_match = False
-                    for site_ in self.current_seq.sites[j]:
-                        if site_[0] > site[1]:
-                            break
-                        overlapped_symbols = self._get_overlapped_symbols(site, site_, i)
-                        site_length_effective = self._get_site_length(site, site_)
-                        if self._check_overlap_sufficiency(overlapped_symbols, site_length_effective):
-                            self.results.site_m[i] += 1
-                            found_match = True
-                            break
-                    if not found_match:
-                        self.results.site_nm[i] += 1
-                    if (detailed_file_h is not None) or (site_file_h is not None):
+                begins, ends = sites[i].begins, sites[i].ends
+                begins_, ends_ = sites[j].begins, sites[j].ends
+                if self.opt.gross:
+                    self.results.site_len[i] += int(np.sum(ends - begins + 1))
+                else:
+                    effective_begins = np.maximum(begins, np.concatenate(([0], ends[: -1])) + 1)
+                    self.results.site_len[i] += int(np.sum(ends - effective_begins + 1))
+                #Candidate partners of a site range from the first one that may overlap with it to the last one beginning not after its end
+                if skip_preceding and len(begins_):
+                    first_candidates = np.searchsorted(np.maximum.accumulate(ends_), begins)
+                else:
+                    first_candidates = np.zeros(len(begins), dtype = np.int64)
+                candidates_n = np.maximum(np.searchsorted(begins_, ends, side = 'right') - first_candidates, 0)
+                pair_sites = np.repeat(np.arange(len(begins)), candidates_n)
+                pair_partners = np.arange(len(pair_sites)) - np.repeat(np.cumsum(candidates_n) - candidates_n - first_candidates, candidates_n)
+                pair_args = (begins[pair_sites], ends[pair_sites], begins_[pair_partners], ends_[pair_partners])
+                overlaps = self._get_overlapped_symbols(*pair_args, i)
+                sufficient_pairs = np.flatnonzero(self._check_overlap_sufficiency(overlaps, self._get_site_length(*pair_args)))
+                #The match of a site is its first partner with a sufficient overlap
+                matched_sites, first_sufficient = np.unique(pair_sites[sufficient_pairs], return_index = True)
+                matched_pairs = sufficient_pairs[first_sufficient]
+                self.results.site_m[i] += len(matched_sites)
+                self.results.site_nm[i] += len(begins) - len(matched_sites)
+                if (detailed_file_h is None) and (site_file_h is None):
+                    continue
+                partners = np.full(len(begins), -1, dtype = np.int64)
+                partners[matched_sites] = pair_partners[matched_pairs]
+                overlapped = np.zeros(len(begins), dtype = np.int64)
+                overlapped[matched_sites] = overlaps[matched_pairs]
+                #Unmatched sites have no overlapped symbols, hence zero percentages with any positive partner length
+                partner_lengths = np.ones(len(begins), dtype = np.int64)
+                partner_lengths[matched_sites] = ends_[partners[matched_sites]] - begins_[partners[matched_sites]] + 1
+                length_percs_1 = round_percentages(overlapped, ends - begins + 1).tolist()
+                length_percs_2 = round_percentages(overlapped, partner_lengths).tolist()
+                begin_list_, end_list_, name_list_ = sites[j].to_lists()
+                #Row of the site-wise output file, whose fields of the sequence and the annotation are set once and those of the site are replaced for each site
+                row = ([self.current_seq.GID] if self.opt.group_map else []) + [self.current_seq.SID, self.global_state.anno_short_name[i]]
+                site_columns = slice(len(row), None)
+                row += [None] * (9 if self.opt.site_names else 7)
+                for begin, end, name, partner, overlapped_symbols, length_perc_1, length_perc_2 in zip(*sites[i].to_lists(), partners.tolist(), overlapped.tolist(), length_percs_1, length_percs_2):
+                    found_match = partner >= 0
+                    if found_match:
+                        begin_ = begin_list_[partner]
+                        end_ = end_list_[partner]
+                    else:
+                        begin_ = end_ = '-'
+                    if detailed_file_h is not None:
+                        site_name_addition = ' ("{}")'.format(name) if self.opt.site_names else ''
+                        message = '{}Site {}-{}{} of the {}: '.format(self.global_state.indent_site, begin, end, site_name_addition, self.global_state.anno_name[i])
                         if found_match:
-                            length_perc_1 = round(100 * overlapped_symbols / (site[1] - site[0] + 1))
-                            length_perc_2 = round(100 * overlapped_symbols / (site_[1] - site_[0] + 1))
-                            begin_ = site_[0]
-                            end_ = site_[1]
+                            ending = '' if overlapped_symbols == 1 else 's'
+                            site_name_addition_ = ' ("{}")'.format(name_list_[partner]) if self.opt.site_names else ''
+                            message += 'overlaps with site {}-{}{} of the {} by {} symbol{} ({}% and {}% of the site lengths respectively)'
+                            message = message.format(begin_, end_, site_name_addition_, self.global_state.anno_name[j], overlapped_symbols, ending, length_perc_1, length_perc_2)
                         else:
-                            overlapped_symbols = length_perc_1 = length_perc_2 = 0
-                            begin_ = end_ = '-'
-                        if detailed_file_h is not None:
-                            site_name_addition = ' ("{}")'.format(site[2]) if self.opt.site_names else ''
-                            message = '{}Site {}-{}{} of the {}: '.format(self.global_state.indent_site, site[0], site[1], site_name_addition, self.global_state.anno_name[i])
+                            message += 'no sufficient overlap found'
+                        detailed_lines.append(message + os.linesep)
+                    if site_file_h is not None:
+                        if self.opt.site_difference == 'unmatched':
                             if found_match:
-                                ending = '' if overlapped_symbols == 1 else 's'
-                                site_name_addition_ = ' ("{}")'.format(site_[2]) if self.opt.site_names else ''
-                                message += 'overlaps with site {}-{}{} of the {} by {} symbol{} ({}% and {}% of the site lengths respectively)'
-                                message = message.format(site_[0], site_[1], site_name_addition_, self.global_state.anno_name[j], overlapped_symbols, ending, length_perc_1, length_perc_2)
-                            else:
-                                message += 'no sufficient overlap found'
-                            detailed_file_h.write(message + os.linesep)
-                        if site_file_h is not None:
-                            if self.opt.site_difference == 'unmatched':
-                                if found_match:
-                                    continue
-                            elif self.opt.site_difference == 'discrepant':
-                                if (length_perc_1 == 100) and (length_perc_2 == 100):
-                                    continue
-                            list_ = [self.current_seq.GID] if self.opt.group_map else []
-                            list_.extend([self.current_seq.SID, self.global_state.anno_short_name[i], site[0], site[1]])
-                            if self.opt.site_names:
-                                list_.append(site[2])
-                            list_.extend([overlapped_symbols, length_perc_1, length_perc_2, begin_, end_])
-                            if self.opt.site_names:
-                                list_.append(site_[2] if found_match else '')
-                            message = ('{}\t' * (len(list_) - 1) + '{}').format(*list_)
-                            site_file_h.write(message + os.linesep)
+                                continue
+                        elif self.opt.site_difference == 'discrepant':
+                            if (length_perc_1 == 100) and (length_perc_2 == 100):
+                                continue
+                        if self.opt.site_names:
+                            row[site_columns] = (begin, end, name, overlapped_symbols, length_perc_1, length_perc_2, begin_, end_, name_list_[partner] if found_match else '')
+                        else:
+                            row[site_columns] = (begin, end, overlapped_symbols, length_perc_1, length_perc_2, begin_, end_)
+                        site_lines.append('\t'.join(map(str, row)) + os.linesep)
         elif self.opt.overlap_apply == 'patched':
             for i in (1, 2):
-                for site in self.current_seq.sites[i]:
-                    matched_symbols = np.sum(self.seq[site[0] - 1: site[1]] == 3)
-                    site_length = site[1] - site[0] + 1
-                    found_match = self._check_overlap_sufficiency(matched_symbols, site_length)
-                    if found_match:
-                        self.results.site_m[i] += 1
-                    else:
-                        self.results.site_nm[i] += 1
-                    if (detailed_file_h is not None) or (site_file_h is not None):
+                j = 3 - i
+                sites = self.current_seq.sites[i]
+                site_matched_symbols = self._count_matched_symbols(i)
+                site_lengths = sites.ends - sites.begins + 1
+                site_found_matches = self._check_overlap_sufficiency(site_matched_symbols, site_lengths)
+                matched_sites_n = int(np.count_nonzero(site_found_matches))
+                self.results.site_m[i] += matched_sites_n
+                self.results.site_nm[i] += len(sites) - matched_sites_n
+                if (detailed_file_h is None) and (site_file_h is None):
+                    continue
+                length_percs = np.where(site_found_matches, round_percentages(site_matched_symbols, site_lengths), 0)
+                row = ([self.current_seq.GID] if self.opt.group_map else []) + [self.current_seq.SID, self.global_state.anno_short_name[i]]
+                site_columns = slice(len(row), None)
+                row += [None] * (5 if self.opt.site_names else 4)
+                for begin, end, name, matched_symbols, length_perc, found_match in zip(*sites.to_lists(), site_matched_symbols.tolist(), length_percs.tolist(), site_found_matches.tolist()):
+                    if detailed_file_h is not None:
+                        message = '{}Site {}-{} of the {}: '.format(self.global_state.indent_site, begin, end, self.global_state.anno_name[i])
                         if found_match:
-                            length_perc = round(100 * matched_symbols / site_length)
+                            ending = '' if matched_symbols == 1 else 's'
+                            message += 'overlaps by total {} symbol{} ({}% of the site length) with sites from the {}'.format(matched_symbols, ending, length_perc, self.global_state.anno_name[j])
                         else:
-                            length_perc = 0
-                        if detailed_file_h is not None:
-                            message = '{}Site {}-{} of the {}: '.format(self.global_state.indent_site, site[0], site[1], self.global_state.anno_name[i])
-                            if found_match:
-                                ending = '' if matched_symbols == 1 else 's'
-                                message += 'overlaps by total {} symbol{} ({}% of the site length) with sites from the {}'.format(matched_symbols, ending, length_perc, self.global_state.anno_name[j])
-                            else:
-                                message += 'no sufficient overlap found'
-                            detailed_file_h.write(message + os.linesep)
+                            message += 'no sufficient overlap found'
+                        detailed_lines.append(message + os.linesep)
                     if site_file_h is not None:
                         if found_match and (self.opt.site_difference == 'unmatched'):
                             continue
-                        list_ = [self.current_seq.GID] if self.opt.group_map else []
-                        list_.extend([self.current_seq.SID, self.global_state.anno_short_name[i], site[0], site[1]])
                         if self.opt.site_names:
-                            list_.append(site[2])
-                        list_.extend([overlapped_symbols, length_perc])
-                        message = ('{}\t' * (len(list_) - 1) + '{}').format(*list_)
-                        site_file_h.write(message + os.linesep)
+                            row[site_columns] = (begin, end, name, matched_symbols, length_perc)
+                        else:
+                            row[site_columns] = (begin, end, matched_symbols, length_perc)
+                        site_lines.append('\t'.join(map(str, row)) + os.linesep)
         else:
             error('Unknown overlap apply method')
+        if site_lines:
+            site_file_h.write(''.join(site_lines))
         for i in (1, 2):
             sites_n = self.results.site_m[i] + self.results.site_nm[i]
             if sites_n == 0:
                 if detailed_file_h:
-                    detailed_file_h.write('{}There are no sites in the {}'.format(self.global_state.indent_site, self.global_state.anno_name[i]) + os.linesep)
+                    detailed_lines.append('{}There are no sites in the {}'.format(self.global_state.indent_site, self.global_state.anno_name[i]) + os.linesep)
                 continue
             else:
                 ending = '' if sites_n == 1 else 's'
@@ -716,88 +947,105 @@ class BasicBooleanSequenceCalculator(BasicSequenceCalculator):
                 insert1 = ' gross' if self.opt.gross else ''
                 message_base = '{}There {} {} site{} in the {} with total length {}{} symbol{}{}'
                 if detailed_file_h:
-                    detailed_file_h.write(message_base.format(self.global_state.indent_site, verb, sites_n, ending, self.global_state.anno_name[i], symbols, insert0, ending1, insert1) + os.linesep)
+                    detailed_lines.append(message_base.format(self.global_state.indent_site, verb, sites_n, ending, self.global_state.anno_name[i], symbols, insert0, ending1, insert1) + os.linesep)
             if detailed_file_h:
                 sites_n = self.results.site_m[i]
                 ending = ' is' if sites_n == 1 else 's are'
-                detailed_file_h.write('{}{} {} site{} matched in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
+                detailed_lines.append('{}{} {} site{} matched in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
                 sites_n = self.results.site_nm[i]
                 ending = ' has' if sites_n == 1 else 's have'
-                detailed_file_h.write('{}{} {} site{} no match in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
-        
+                detailed_lines.append('{}{} {} site{} no match in the {}'.format(self.global_state.indent_site, sites_n, self.global_state.anno_name[i], ending, self.global_state.anno_name[j]) + os.linesep)
+        if detailed_lines:
+            detailed_file_h.write(''.join(detailed_lines))
+
 class BasicEnrichmentSequenceCalculator(BasicSequenceCalculator):
     """Class for calculating basic enrichment measures and write into files required output annotations in a particular sequence"""
     def __init__(self, global_state, opt, current_seq):
         BasicSequenceCalculator.__init__(self, global_state, opt, current_seq)
         self.n = self.opt.enrichment_count
         bytes_required = self._estimate_required_precison()
-        self.seq = [None] + [np.zeros(shape = current_seq.length, dtype = 'i' + str(bytes_required)) for x in range(2)]
+        self.seq = [None] + [aligned_zeros(current_seq.length, 'i' + str(bytes_required)) for x in range(2)]
         self.results = BasicEnrichmentMeasures()
         self._count_occurrences()
     def _count_occurrences(self):
         """Method to count the occurences in the annotations for each symbol in the sequence"""
         for i in (1, 2):
-            for site in self.current_seq.sites[i]:
-                for idx in range(site[0] - 1, site[1]):
-                    self.seq[i][idx] += 1
-    def _in_union(self, idx):
-        """Method to check if given symbol is in the enrichment annotation union"""
-        for i in (1, 2):
-            if self.seq[i][idx] >= self.n:
-                return True
-        return False
-    def _in_intersection(self, idx):
-        """Method to check if given symbol is in the enrichment annotation intersection"""
-        check = 0
-        for i in (1, 2):
-            if self.seq[i][idx] >= self.n:
-                check += 1
-        return True if check == 2 else False
-    def _in_complement1(self, idx):
-        """Method to check if given symbol is in the enrichment annotation complement of the first"""
-        return True if (self.seq[1][idx] < self.n) and (self.seq[2][idx] >= self.n) else False
-    def _in_complement2(self, idx):
-        """Method to check if given symbol is in the enrichment annotation complement of the second"""
-        return True if (self.seq[1][idx] >= self.n) and (self.seq[2][idx] < self.n) else False
-    def _in_re1(self, idx):
-        """Method to check if given symbol is in the annotation of relative enrichment for the first annotation"""
-        return True if self.seq[1][idx] - self.seq[2][idx] >= self.n else False
-    def _in_re2(self, idx):
-        """Method to check if given symbol is in the annotation of relative enrichment for the first annotation"""
-        return True if self.seq[2][idx] - self.seq[1][idx] >= self.n else False
+            self.seq[i][: ] = self._count_site_coverage(i)
+    def _in_enriched1(self):
+        """Method to get the Boolean mask of the symbols enriched in the first annotation"""
+        return self.seq[1] >= self.n
+    def _in_enriched2(self):
+        """Method to get the Boolean mask of the symbols enriched in the second annotation"""
+        return self.seq[2] >= self.n
+    def _in_union(self):
+        """Method to get the Boolean mask of the symbols in the enrichment annotation union"""
+        return self._mask_for('enriched1') | self._mask_for('enriched2')
+    def _in_intersection(self):
+        """Method to get the Boolean mask of the symbols in the enrichment annotation intersection"""
+        return self._mask_for('enriched1') & self._mask_for('enriched2')
+    def _in_complement1(self):
+        """Method to get the Boolean mask of the symbols in the enrichment annotation complement of the first"""
+        return ~self._mask_for('enriched1') & self._mask_for('enriched2')
+    def _in_complement2(self):
+        """Method to get the Boolean mask of the symbols in the enrichment annotation complement of the second"""
+        return self._mask_for('enriched1') & ~self._mask_for('enriched2')
+    def _in_re1(self):
+        """Method to get the Boolean mask of the symbols in the annotation of relative enrichment for the first annotation"""
+        return self.seq[1] - self.seq[2] >= self.n
+    def _in_re2(self):
+        """Method to get the Boolean mask of the symbols in the annotation of relative enrichment for the first annotation"""
+        return self.seq[2] - self.seq[1] >= self.n
     def _estimate_required_precison(self):
         """Method to provide a higher estimation for the reeqired integer precision of the counts"""
-        count_limit = max(len(self.current_seq.sites[1]), len(self.current_seq.sites[2])) + 1
-        bytes_required = math.ceil((math.ceil(math.log(count_limit, 2)) + 1) / 8)
-        if bytes_required > 8:
+        #A count cannot exceed the number of sites, and one more bit is needed for the sign of the count differences
+        bits_required = max(len(self.current_seq.sites[1]), len(self.current_seq.sites[2])).bit_length() + 1
+        if bits_required > 64:
             error("Too  many sites annotated. Maximal number is {}".format(2 ** 63 - 1))
-        bytes_required = [1, 1, 2, 4, 4, 8, 8, 8, 8][bytes_required]
-        return bytes_required
+        for bytes_required in (1, 2, 4, 8):
+            if bits_required <= 8 * bytes_required:
+                return bytes_required
     def _write_measure_info_to_detailed_file(self, symbols_n, description, file_handler):
         """Writing the information on sybol counts in a specific category"""
         ending = ' is' if symbols_n == 1 else 's are'
         file_handler.write('{}{} symbol{} enriched in {}'.format(self.global_state.indent_site, symbols_n, ending, description) + os.linesep)
     def calculate_residue_wise(self, file_handler):
         """Method to calculate count residue-wise measures for a given sequence"""
+        #A single counting pass over the joint codes of enrichment in the first (bit 1) and the second (bit 2) annotations
+        ne, e_only1, e_only2, ee = np.bincount(self._mask_for('enriched1').view('i1') | (self._mask_for('enriched2').view('i1') << 1), minlength = 4)
+        e = [None, e_only1 + ee, e_only2 + ee]
+        self.results.e[1] = e[1]
+        self.results.e[2] = e[2]
+        self.results.ee = ee
+        self.results.ne = ne
         for i in (1, 2):
-            j = 2 if i == 1 else 1
-            self.results.e[i] = np.sum(self.seq[i] >= self.n)
-            description = 'the ' + self.global_state.anno_name[i]
-            self._write_measure_info_to_detailed_file(self.results.e[i], description, file_handler)
-            self.results.re[i] = np.sum((self.seq[i] - self.seq[j]) >= self.n)
-        self.results.ee = np.sum((self.seq[1] >= self.n) * (self.seq[2] >= self.n))
-        self._write_measure_info_to_detailed_file(self.results.ee, 'both annotations', file_handler)
-        self.results.ne = np.sum((self.seq[1] < self.n) * (self.seq[2] < self.n))
-        self._write_measure_info_to_detailed_file(self.results.ne, 'neither annotations', file_handler)
-        self.results.nre = self.seq_length - self.results.re[1] - self.results.re[2]
+            self.results.re[i] = np.count_nonzero(self._mask_for('re' + str(i)))
+        self.results.nre = self.current_seq.length - self.results.re[1] - self.results.re[2]
+        if file_handler is not None:
+            for i in (1, 2):
+                self._write_measure_info_to_detailed_file(e[i], 'the ' + self.global_state.anno_name[i], file_handler)
+            self._write_measure_info_to_detailed_file(ee, 'both annotations', file_handler)
+            self._write_measure_info_to_detailed_file(ne, 'neither annotations', file_handler)
+
+def calculate_sequence_measures(global_state, opt, current_seq):
+    """Function to calculate basic measures for a sequence without writing any output, to be run in the worker processes"""
+    if opt.enrichment_count == 0:
+        basic_sequence_calculator = BasicBooleanSequenceCalculator(global_state, opt, current_seq)
+        basic_sequence_calculator.calculate_residue_wise(None)
+        basic_sequence_calculator.calculate_site_wise(None, None)
+    else:
+        basic_sequence_calculator = BasicEnrichmentSequenceCalculator(global_state, opt, current_seq)
+        basic_sequence_calculator.calculate_residue_wise(None)
+    return basic_sequence_calculator.get_results()
 
 class BasicCalculator:
     """Class to calculate selected basic measures and write into files required output annotations for a sequence group"""
-    def __init__(self, global_state, opt, input_data, file_handlers):
+    def __init__(self, global_state, opt, input_data, file_handlers, executor = None):
         self.global_state = global_state
         self.opt = opt
         self.input_data = input_data
         self.file_handlers = file_handlers
+        #Pool of worker processes for the sequences, if they are processed in parallel
+        self.executor = executor
     def _process_sequence(self, current_seq):
         """Method to calculate basic measures for annotatopns of sites in a particular sequence in a particular group"""
         args = (self.global_state, self.opt, current_seq)
@@ -810,18 +1058,24 @@ class BasicCalculator:
             basic_sequence_calculator.calculate_site_wise(self.file_handlers.detailed, self.file_handlers.site)
         basic_sequence_calculator.write_to_files(self.file_handlers)
         return basic_sequence_calculator.get_results()
-    def process_group(self, GID):
-        """Method to calculate basic measures for a giben sequence group"""
+    def _get_current_sequences(self, GID):
+        """Method to collect the data on the sequences of a given group"""
+        return [CurrentSequence(GID, SID, self.input_data.seq_len[SID], [None] + [self.input_data.sites[i][GID][SID] for i in (1, 2)]) for SID in self.input_data.group_map[GID]]
+    def _map_to_workers(self, current_seqs):
+        """Method to calculate basic measures for given sequences in the worker processes, with the results yielded in the order of the sequences"""
+        #Sequences are sent to the workers in chunks to reduce the communication overhead
+        chunk_size = max(1, len(current_seqs) // (4 * self.opt.jobs))
+        return self.executor.map(calculate_sequence_measures, repeat(self.global_state), repeat(self.opt), current_seqs, chunksize = chunk_size)
+    def _aggregate_group(self, GID, current_seqs, all_results):
+        """Method to average basic measures over the sequences of a given group, taking the results for the sequences from an iterator"""
         group_results = None
         averaging_count = 0
         if self.opt.group_map and (self.file_handlers.detailed is not None):
-            group_len = len(self.input_data.group_map[GID])
+            group_len = len(current_seqs)
             self.file_handlers.detailed.write('Information on the group "{}" (contains {} sequence{}):'.format(GID, group_len, ('s' if group_len > 1 else '')) + os.linesep)
-        for SID in self.input_data.group_map[GID]:
-            seq_length = self.input_data.seq_len[SID]
-            sites = [None] + [self.input_data.sites[i][GID][SID] for i in (1, 2)]
-            current_seq = CurrentSequence(GID, SID, seq_length, sites)
-            results = self._process_sequence(current_seq)
+        #The iterator is advanced only as many times as there are sequences in the group
+        for current_seq, results in zip(current_seqs, all_results):
+            seq_length = current_seq.length
             if not self.opt.groupwise:
                 results /= seq_length
             averaging_count += (seq_length if self.opt.groupwise else 1)
@@ -830,9 +1084,24 @@ class BasicCalculator:
                 continue
             group_results += results
         group_results /= averaging_count
-        group_results.seq_n = len(self.input_data.group_map[GID])
+        group_results.seq_n = len(current_seqs)
         return group_results
-        
+    def process_group(self, GID):
+        """Method to calculate basic measures for a giben sequence group"""
+        current_seqs = self._get_current_sequences(GID)
+        all_results = map(self._process_sequence, current_seqs) if self.executor is None else self._map_to_workers(current_seqs)
+        return self._aggregate_group(GID, current_seqs, all_results)
+    def process_groups(self, GIDs):
+        """Method to calculate basic measures for given sequence groups one by one, sending the sequences of all the groups to the worker processes in a single batch"""
+        if self.executor is None:
+            for GID in GIDs:
+                yield self.process_group(GID)
+            return
+        group_seqs = [self._get_current_sequences(GID) for GID in GIDs]
+        all_results = self._map_to_workers(list(chain.from_iterable(group_seqs)))
+        for GID, current_seqs in zip(GIDs, group_seqs):
+            yield self._aggregate_group(GID, current_seqs, all_results)
+
 class PerformanceCalculator:
     """Class to calculate all selected performance measures and write into files required output annotations for a given group"""
     def __init__(self, global_state, opt, input_data, file_handlers):
@@ -840,6 +1109,9 @@ class PerformanceCalculator:
         self.opt = opt
         self.input_data = input_data
         self.file_handlers = file_handlers
+        self.basic_calculator = BasicCalculator(global_state, opt, input_data, file_handlers)
+        #Methods calculating the selected measures, in the order of the name map
+        self._calc_methods = tuple(getattr(self, '_calc_' + measure.var_name) for measure in PerformanceMeasures(opt.enrichment_count, opt.benchmark, opt.gross).name_map)
     def _calc_p1(self):
         """Method to calculate share of symbols present in the first annotation"""
         p1 = self.basic_measures.pp + self.basic_measures.pa
@@ -875,35 +1147,39 @@ class PerformanceCalculator:
     def _calc_rc2(self):
         """Method to calculate symbol-wise recall for the second annotation"""
         denominator = self.basic_measures.pp_[1] + self.basic_measures.pa
-        rc2 = self.basic_measures.pp_[1] / denominator if denominator > 0.0 else float('nan')
+        rc2 = self.basic_measures.pp_[1] / denominator if denominator > 0.0 else _NAN
+        self._rc2 = rc2
         self.performance_measures.set_value('rc2', rc2)
     def _calc_pr2(self):
         """Method to calculate symbol-wise precision for the second annotation"""
         denominator = self.basic_measures.pp_[2] + self.basic_measures.ap
-        pr2 = self.basic_measures.pp_[2] / denominator if denominator > 0.0 else float('nan')
+        pr2 = self.basic_measures.pp_[2] / denominator if denominator > 0.0 else _NAN
+        self._pr2 = pr2
         self.performance_measures.set_value('pr2', pr2)
     def _calc_sp2(self):
         """Method to calculate symbol-wise specificity for the second annotation"""
         denominator = self.basic_measures.aa + self.basic_measures.ap
-        sp2 = self.basic_measures.aa / denominator if denominator > 0.0 else float('nan')
+        sp2 = self.basic_measures.aa / denominator if denominator > 0.0 else _NAN
+        self._sp2 = sp2
         self.performance_measures.set_value('sp2', sp2)
     def _calc_npv2(self):
         """Method to calculate symbol-wise negative predictive value for the second annotation"""
         denominator = self.basic_measures.aa + self.basic_measures.pa
-        npv2 = self.basic_measures.aa / denominator if denominator > 0.0 else float('nan')
+        npv2 = self.basic_measures.aa / denominator if denominator > 0.0 else _NAN
+        self._npv2 = npv2
         self.performance_measures.set_value('npv2', npv2)
     def _calc_in2(self):
         """Method to calculate symbol-wise informedness for the second annotation"""
-        in2 = self.performance_measures.get_value('rc2') + self.performance_measures.get_value('sp2') - 1
+        in2 = self._rc2 + self._sp2 - 1
         self.performance_measures.set_value('in2', in2)
     def _calc_mk2(self):
         """Method to calculate symbol-wise markedness for the second annotation"""
-        mk2 = self.performance_measures.get_value('pr2') + self.performance_measures.get_value('npv2') - 1
+        mk2 = self._pr2 + self._npv2 - 1
         self.performance_measures.set_value('mk2', mk2)
     def _calc_pc(self):
         """Method to calculate symbol-wise performance coefficient"""
         denominator = self.basic_measures.pp_[2] + self.basic_measures.ap + self.basic_measures.pa
-        pc = self.basic_measures.pp_[2] / denominator if denominator > 0.0 else float('nan')
+        pc = self.basic_measures.pp_[2] / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('pc', pc)
     def _calc_acc(self):
         """Method to calculate symbol-wise accuracy ACC"""
@@ -911,14 +1187,18 @@ class PerformanceCalculator:
         self.performance_measures.set_value('acc', acc)
     def _calc_mcc(self):
         """Method to calculate symbol-wise Matthews correlation coefficient"""
-        numerator = self.basic_measures.pp * self.basic_measures.aa + self.basic_measures.ap * self.basic_measures.pa
         temp = (self.basic_measures.pp + self.basic_measures.pa) * (self.basic_measures.pp + self.basic_measures.ap) * (self.basic_measures.aa + self.basic_measures.ap) * (self.basic_measures.aa + self.basic_measures.pa)
-        mcc = numerator / math.sqrt(temp) if temp > 0.0 else float('nan')
+        #The numerator is needed only if the coefficient is defined
+        if temp > 0.0:
+            numerator = self.basic_measures.pp * self.basic_measures.aa + self.basic_measures.ap * self.basic_measures.pa
+            mcc = numerator / math.sqrt(temp)
+        else:
+            mcc = _NAN
         self.performance_measures.set_value('mcc', mcc)
     def _calc_f1(self):
         """Method to calculate symbol-wise F1 score"""
         denominator = 2 * self.basic_measures.pp_[1] * self.basic_measures.pp_[2] + self.basic_measures.pp_[2] * self.basic_measures.pa + self.basic_measures.pp_[1] * self.basic_measures.ap
-        f1 = 2 * self.basic_measures.pp_[1] * self.basic_measures.pp_[2] / denominator if denominator > 0.0 else float('nan')
+        f1 = 2 * self.basic_measures.pp_[1] * self.basic_measures.pp_[2] / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('f1', f1)
     def _calc_site_n1(self):
         """Method to calculate number of sites in the first annotation"""
@@ -939,29 +1219,29 @@ class PerformanceCalculator:
     def _calc_site_rc2(self):
         """Method to calculate site-wise recall for the second annotation"""
         denominator = self.basic_measures.site_m[1] + self.basic_measures.site_nm[1]
-        site_rc2 = self.basic_measures.site_m[1] / denominator if denominator > 0.0 else float('nan')
+        site_rc2 = self.basic_measures.site_m[1] / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('site_rc2', site_rc2)
     def _calc_site_pr2(self):
         """Method to calculate site-wise recall for the second annotation"""
         denominator = self.basic_measures.site_m[2] + self.basic_measures.site_nm[2]
-        site_pr2 = self.basic_measures.site_m[2] / denominator if denominator > 0.0 else float('nan')
+        site_pr2 = self.basic_measures.site_m[2] / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('site_pr2', site_pr2)
     def _calc_site_pc2(self):
         """Method to calculate site-wise performance coefficient for the second annotation"""
         denominator = self.basic_measures.site_m[2] + self.basic_measures.site_nm[2] + self.basic_measures.site_nm[1]
-        site_pc2 = self.basic_measures.site_m[2] / denominator if denominator > 0.0 else float('nan')
+        site_pc2 = self.basic_measures.site_m[2] / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('site_pc2', site_pc2)
     def _calc_site_f1(self):
         """Method to calculate site-wise F1 score"""
         temp = 2 * self.basic_measures.site_m[1] * self.basic_measures.site_m[2]
         denominator = temp + self.basic_measures.site_nm[1] * self.basic_measures.site_m[2] + self.basic_measures.site_nm[2] * self.basic_measures.site_m[1]
-        site_f1 = temp / denominator if denominator > 0.0 else float('nan')
+        site_f1 = temp / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('site_f1', site_f1)
     def _calc_site_pcv(self):
         """Method to calculate site-wise positive correlation value"""
         temp = self.basic_measures.site_m[1] + self.basic_measures.site_m[2]
         denominator = temp + self.basic_measures.site_nm[1] + self.basic_measures.site_nm[2]
-        site_pcv = temp / denominator if denominator > 0.0 else float('nan')
+        site_pcv = temp / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('site_pcv', site_pcv)
     def _calc_e_p1(self):
         """Method to copy share of symbols enriched in the first annotation"""
@@ -989,34 +1269,38 @@ class PerformanceCalculator:
         self.performance_measures.set_value('e_aa', e_aa)
     def _calc_e_rc2(self):
         """Method to calculate symbol-wise enrichment recall for the second annotation"""
-        e_rc2 = self.basic_measures.ee / self.basic_measures.e[1] if self.basic_measures.e[1] > 0.0 else float('nan')
+        e_rc2 = self.basic_measures.ee / self.basic_measures.e[1] if self.basic_measures.e[1] > 0.0 else _NAN
+        self._e_rc2 = e_rc2
         self.performance_measures.set_value('e_rc2', e_rc2)
     def _calc_e_pr2(self):
         """Method to calculate symbol-wise enrichment precision for the second annotation"""
-        e_pr2 = self.basic_measures.ee / self.basic_measures.e[2] if self.basic_measures.e[2] > 0.0 else float('nan')
+        e_pr2 = self.basic_measures.ee / self.basic_measures.e[2] if self.basic_measures.e[2] > 0.0 else _NAN
+        self._e_pr2 = e_pr2
         self.performance_measures.set_value('e_pr2', e_pr2)
     def _calc_e_sp2(self):
         """Method to calculate symbol-wise enrichment specificity for the second annotation"""
         denominator = 1 - self.basic_measures.e[1]
-        e_sp2 = self.basic_measures.ne / denominator if denominator > 0.0 else float('nan')
+        e_sp2 = self.basic_measures.ne / denominator if denominator > 0.0 else _NAN
+        self._e_sp2 = e_sp2
         self.performance_measures.set_value('e_sp2', e_sp2)
     def _calc_e_npv2(self):
         """Method to calculate symbol-wise enrichment negative predictive value for the second annotation"""
         denominator = 1 - self.basic_measures.e[2]
-        e_npv2 = self.basic_measures.ne / denominator if denominator > 0.0 else float('nan')
+        e_npv2 = self.basic_measures.ne / denominator if denominator > 0.0 else _NAN
+        self._e_npv2 = e_npv2
         self.performance_measures.set_value('e_npv2', e_npv2)
     def _calc_e_in2(self):
         """Method to calculate symbol-wise enrichment informedness for the second annotation"""
-        e_in2 = self.performance_measures.get_value('e_rc2') + self.performance_measures.get_value('e_sp2') - 1
+        e_in2 = self._e_rc2 + self._e_sp2 - 1
         self.performance_measures.set_value('e_in2', e_in2)
     def _calc_e_mk2(self):
         """Method to calculate symbol-wise enrichment markedness for the second annotation"""
-        e_mk2 = self.performance_measures.get_value('e_pr2') + self.performance_measures.get_value('e_npv2') - 1
+        e_mk2 = self._e_pr2 + self._e_npv2 - 1
         self.performance_measures.set_value('e_mk2', e_mk2)
     def _calc_e_pc(self):
         """Method to calculate symbol-wise enrichment performance coefficient"""
         denominator = 1 - self.basic_measures.ne
-        e_pc = self.basic_measures.ee / denominator if denominator > 0.0 else float('nan')
+        e_pc = self.basic_measures.ee / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('e_pc', e_pc)
     def _calc_e_acc(self):
         """Method to calculate symbol-wise enrichment accuracy ACC"""
@@ -1024,37 +1308,59 @@ class PerformanceCalculator:
         self.performance_measures.set_value('e_acc', e_acc)
     def _calc_e_mcc(self):
         """Method to calculate symbol-wise enrichment Matthews correlation coefficient"""
-        only_in_1 = self.basic_measures.e[1] - self.basic_measures.ee
-        only_in_2 = self.basic_measures.e[2] - self.basic_measures.ee
-        numerator = self.basic_measures.ee * self.basic_measures.ne + only_in_1 * only_in_2
-        denominator = math.sqrt((self.basic_measures.ee + only_in_1) * (self.basic_measures.ee + only_in_2) * (self.basic_measures.ne + only_in_1) * (self.basic_measures.ne + only_in_2))
-        e_mcc = numerator / denominator if denominator > 0.0 else float('nan')
+        e1 = self.basic_measures.e[1]
+        e2 = self.basic_measures.e[2]
+        ee = self.basic_measures.ee
+        #Shares of symbols enriched exclusively in either annotation, reused for the enrichment asymmetry coefficient that follows in the name map
+        self._e_only_in_1 = e1 - ee
+        self._e_only_in_2 = e2 - ee
+        #The shares of symbols enriched in both, exclusively in either and in neither annotation sum up to one, so the marginal sums are the shares enriched in either annotation and their complements
+        denominator_squared = e1 * e2 * (1.0 - e1) * (1.0 - e2)
+        if denominator_squared > 0.0:
+            e_mcc = (ee * self.basic_measures.ne + self._e_only_in_1 * self._e_only_in_2) / math.sqrt(denominator_squared)
+        else:
+            e_mcc = _NAN
         self.performance_measures.set_value('e_mcc', e_mcc)
     def _calc_e_f1(self):
         """Method to calculate symbol-wise enrichment F1 score"""
         denominator = self.basic_measures.e[1] + self.basic_measures.e[2]
-        e_f1 = 2 * self.basic_measures.ee / denominator if denominator > 0.0 else float('nan')
+        e_f1 = 2 * self.basic_measures.ee / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('e_f1', e_f1)
     def _calc_e_eac(self):
         """Method to calculate enrichment asymmetry coefficient"""
-        denominator = self.basic_measures.e[1] + self.basic_measures.e[2] - self.basic_measures.ee
-        e_eac = (self.basic_measures.re[1] + self.basic_measures.re[2]) / denominator if denominator > 0.0 else float('nan')
+        denominator = self._e_only_in_1 + self._e_only_in_2 + self.basic_measures.ee
+        e_eac = (self.basic_measures.re[1] + self.basic_measures.re[2]) / denominator if denominator > 0.0 else _NAN
         self.performance_measures.set_value('e_eac', e_eac)
     def _calc_seq_n(self):
         """Method to copy the number of sequences in the group"""
         seq_n = self.basic_measures.seq_n
         self.performance_measures.set_value('seq_n', seq_n)
-    def process_group(self, GID):
-        """Method to calculate all relevant count performance measures for a giben sequence group"""
-        basic_calculator = BasicCalculator(self.global_state, self.opt, self.input_data, self.file_handlers)
-        self.basic_measures = basic_calculator.process_group(GID)
+    def _calc_performance_measures(self, basic_measures):
+        """Method to calculate all relevant count performance measures from the basic measures of a group"""
+        #The measures are calculated from plain Python numbers, which are faster to access than the elements of arrays
+        self.basic_measures = basic_measures.unpack()
         self.performance_measures = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
-        for measure in self.performance_measures.name_map:
-            getattr(self, '_calc_' + measure.var_name)()
+        for calc_method in self._calc_methods:
+            calc_method()
         return self.performance_measures
+    def process_group(self, GID):
+        """Method to calculate all relevant count performance measures for a giben sequence group"""
+        return self._calc_performance_measures(self.basic_calculator.process_group(GID))
+    def process_groups(self, GIDs):
+        """Method to calculate all relevant count performance measures for given sequence groups, yielding them group by group"""
+        for basic_measures in self.basic_calculator.process_groups(GIDs):
+            yield self._calc_performance_measures(basic_measures)
 
 class DataProcessor:
     """Class to calculate and save into corresponding files performance measures as well as output annotations for each group and the whole database"""
+    #Descriptions of the output files by their types, used in the messages on writing them
+    output_file_descriptions = {'union': 'union annotation', 'intersection': 'intersection annotation', 'complement1': 'complement of the first annotation',
+        'complement2': 'complement of the second annotation', 're1': 'relative enrichment for the first annotation', 're2': 'relative enrichment for the second annotation',
+        'detailed': 'detailed output', 'site': 'site statistics'}
+    #Minimal number of sequences per worker process for the sequences to be processed in parallel
+    min_sequences_per_job = 16
+    #Format specifications of fixed-point numbers by the number of decimal places
+    _precision_specs = tuple('.{}f'.format(i) for i in range(16))
     def __init__(self, opt, global_state, input_data):
         self.opt = opt
         self.input_data = input_data
@@ -1062,37 +1368,64 @@ class DataProcessor:
         self.global_state = global_state
         self.performance_calculator = PerformanceCalculator(global_state, opt, input_data, self.file_handlers)
         self.database_results = PerformanceMeasures(self.opt.enrichment_count, self.opt.benchmark, self.opt.gross)
+    @staticmethod
     def _float_to_fixed_width_str(value, width):
         """Method to make the best attempt to represent a float as fixed-width string"""
+        #NaN values are never equal to each other, so they would only flood the cache
+        if value != value:
+            return 'nan'
+        return DataProcessor._fixed_width_str(value, width)
+    @staticmethod
+    @functools.lru_cache(maxsize = 4096)
+    def _fixed_width_str(value, width):
+        """Method to represent a non-NaN float as fixed-width string, remembering the recent representations"""
         for i in range(width - 2, -1, -1):
-            str0 = '{:.{}f}'.format(value, i)
+            str0 = format(value, DataProcessor._precision_specs[i])
             if len(str0) <= width:
                 break
         return str0
+    @staticmethod
+    @functools.lru_cache(maxsize = None)
+    def _site_header(grouped, site_names, patched):
+        """Method to form the header of the site-wise output file for a given combination of the output settings"""
+        header = ('GID\t' if grouped else '') + 'SID\tAnnotation\tSite begin\tSite end\t'
+        if site_names:
+            header += 'Site name\t'
+        if patched:
+            header += 'Matched symbols\tMatched perc.\n'
+        else:
+            header += 'Overlapped symbols\tOverlapped perc.\tPartner overlapped perc.\tPartner begin\tPartner end'
+        if site_names:
+            header += '\tPartner name'
+        return header + os.linesep
     def _open_output_files(self):
         """Method to open required output annotation files"""
         for type_ in FileHandlers.output_file_types:
             filepath = getattr(self.opt, 'output_file_' + type_)
             if not filepath:
                 continue
-            file_handler = open(filepath, 'w')
             if type_ == 'detailed':
-                pass
+                header = ''
             elif type_ == 'site':
-                header = ('GID\t' if self.opt.group_map else '') + 'SID\tAnnotation\tSite begin\tSite end\t'
-                if self.opt.site_names:
-                    header += 'Site name\t'
-                if self.opt.overlap_apply == 'patched':
-                    header += 'Matched symbols\tMatched perc.\n'
-                else:
-                    header += 'Overlapped symbols\tOverlapped perc.\tPartner overlapped perc.\tPartner begin\tPartner end'
-                if self.opt.site_names:
-                    header += '\tPartner name'
-                file_handler.write(header + os.linesep)
+                header = DataProcessor._site_header(bool(self.opt.group_map), self.opt.site_names, self.opt.overlap_apply == 'patched')
             else:
                 header = ('GID\t' if self.opt.group_map else '') + 'SID\tbegin\tend\n'
-                file_handler.write(header)
-            setattr(self.file_handlers, type_, file_handler)
+            try:
+                setattr(self.file_handlers, type_, LazyFile(filepath, header))
+            except OSError as e:
+                error('The {} file "{}" cannot be opened for writing. {}'.format(DataProcessor.output_file_descriptions[type_], filepath, e.strerror))
+    def _start_workers(self):
+        """Method to start the worker processes for the sequences if parallel processing is requested and no output file other than the measures table is written"""
+        if self.opt.jobs < 2:
+            return None
+        for type_ in FileHandlers.output_file_types:
+            if getattr(self.file_handlers, type_) is not None:
+                return None
+        #Starting the workers costs more than it saves if each of them gets only a few sequences
+        sequences_n = sum(len(SIDs) for SIDs in self.input_data.group_map.values())
+        if sequences_n < DataProcessor.min_sequences_per_job * self.opt.jobs:
+            return None
+        return ProcessPoolExecutor(max_workers = self.opt.jobs, mp_context = multiprocessing.get_context('fork'))
     def _close_output_files(self):
         """Method to close ouptput annotation files"""
         for type_ in FileHandlers.output_file_types:
@@ -1101,65 +1434,62 @@ class DataProcessor:
                 continue
             handler.close()
             filepath = getattr(self.opt, 'output_file_' + type_)
-            description = type_
-            description.replace('complement', 'complement of')
-            description = re.sub('$re', 'relative enrichment for', description)
-            description.replace('1', ' the first')
-            description.replace('1', ' the second')
-            if type_ == 'detailed':
-                output_type = 'output'
-            elif type_ == 'site':
-                output_type = 'statistics'
-            else:
-                output_type = 'annotatiion'
-            description += ' ' + output_type
-            print("The {} file '{}' has been written".format(description, filepath))
+            print("The {} file '{}' has been written".format(DataProcessor.output_file_descriptions[type_], filepath))
+    @staticmethod
+    @functools.lru_cache(maxsize = 8)
+    def _generate_header_tail(grouped, clean, name_map):
+        """Method to form the part of the header that does not depend on the launch, with the descriptions of the measures and the column names"""
+        header = ''
+        if not clean:
+            header += '# The following statistics have been calculated:' + os.linesep
+            for measure in name_map:
+                header += '#    {}: {}'.format(measure.displayed_name, measure.description) + os.linesep
+        column_names = ('GID\t' if grouped else '') + ''.join(measure.displayed_name + '\t' for measure in name_map)
+        return header + column_names + os.linesep
     def _generate_header(self, grouped):
         """Method to form the header with basic launch information as well as relevant column names"""
         header = ''
         if not self.opt.clean:
             header += "# This file was generated at {} with THE METHOD".format(str(datetime.datetime.now())[: -7]) + os.linesep
             header += '# Command line options (unquoted and unescaped): ' + ' '.join(sys.argv[1: ]) + os.linesep
-            header += '# The following statistics have been calculated:' + os.linesep
-        column_names = 'GID\t' if grouped else ''
-        for measure in self.database_results.name_map:
-            if not self.opt.clean:
-                header += '#    {}: {}'.format(measure.displayed_name, measure.description) + os.linesep
-            column_names += measure.displayed_name + '\t'
-        header += column_names + os.linesep
-        return header
-    def _produce_final_string(self, results, attr_names, na_zeros, groups_n):
+        return header + DataProcessor._generate_header_tail(bool(grouped), self.opt.clean, self.database_results.name_map)
+    def _produce_final_string(self, results, na_zeros, groups_n):
         """Method to calculate database-wide averages of relevance performance measures and save them to the string"""
-        final_string = 'Average\t' if groups_n else ''
-        for attr_name in attr_names:
-            value = results.get_value(attr_name)
-            if not na_zeros:
-                if not math.isnan(value):
-                    value = value / results.get_count(attr_name) if groups_n else value
-            else:
-                if math.isnan(value):
-                    value = 0.0
-                else:
-                    value = value / groups_n if groups_n else value
-            final_string += (str(value) if type(value)==int else DataProcessor._float_to_fixed_width_str(value, 6)) + '\t'
-        return final_string[: -1] 
+        values, counts = results.as_arrays()
+        if na_zeros:
+            values = np.where(np.isnan(values), 0.0, values / groups_n if groups_n else values)
+        elif groups_n:
+            #Only the measures not calculated in any group have zero counts, and they stay NaN
+            values = np.divide(values, counts, out = values, where = counts > 0)
+        fields = ['Average'] if groups_n else []
+        for measure, value in zip(results.name_map, values.tolist()):
+            #Integer measures stay integers unless averaged over groups
+            fields.append(str(int(value)) if (measure.type_ == 'int') and (not groups_n) else DataProcessor._float_to_fixed_width_str(value, 6))
+        return '\t'.join(fields)
     def process(self):
         """Method to coordinate the input data processing and outputting"""
         self._open_output_files()
-        with open(self.opt.output_file, 'w') as ofile:
+        executor = self.performance_calculator.basic_calculator.executor = self._start_workers()
+        with open(self.opt.output_file, 'w', buffering = LazyFile.buffer_size) as ofile:
             header = self._generate_header(self.opt.group_map)
             ofile.write(header)
-            attr_names = [x.var_name for x in self.database_results.name_map]
+            attr_names = self.database_results.attr_names
+            #The summary over all groups is not output for clean grouped runs, so the group results need not be kept
+            need_summary = (not self.opt.clean) or (not self.opt.group_map)
             if self.opt.group_map:
-                for GID in self.input_data.group_map.keys():
-                    group_results = self.performance_calculator.process_group(GID)
-                    row = GID
-                    for attr_name in attr_names:
-                        value = group_results.get_value(attr_name)
-                        value = '{:.4f}'.format(value) if type(value) != int else str(value)
-                        row += '\t' + value
-                    ofile.write(row + os.linesep)
-                    self.database_results += group_results
+                GIDs = list(self.input_data.group_map.keys())
+                #Rows of the groups, written at once
+                rows = []
+                all_group_results = []
+                for GID, group_results in zip(GIDs, self.performance_calculator.process_groups(GIDs)):
+                    row = [GID]
+                    row.extend((format(value, '.4f') if type(value) != int else str(value)) for value in group_results.iter_values())
+                    rows.append('\t'.join(row) + os.linesep)
+                    if need_summary:
+                        all_group_results.append(group_results)
+                ofile.write(''.join(rows))
+                if need_summary:
+                    self.database_results.add_all(all_group_results)
                 if not self.opt.clean:
                     ofile.write('-' * (8 * (len(attr_names) + 1)) + os.linesep)
                 groups_n = len(self.input_data.group_map)
@@ -1167,7 +1497,9 @@ class DataProcessor:
                 self.database_results = self.performance_calculator.process_group('')
                 groups_n = 0
             if (not self.opt.clean) or (groups_n == 0):
-                ofile.write(self._produce_final_string(self.database_results, attr_names, self.opt.na_zeros, groups_n))
+                ofile.write(self._produce_final_string(self.database_results, self.opt.na_zeros, groups_n))
+        if executor is not None:
+            executor.shutdown()
         print("The output file '{}' with performance measures has been written".format(self.opt.output_file))
         self._close_output_files()
             
\ No newline at end of file
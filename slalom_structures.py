@@ -1,5 +1,7 @@
-import math, copy
+import copy, functools
+import numpy as np
 from collections import defaultdict, OrderedDict, Callable
+from types import SimpleNamespace
 
 class DefaultOrderedDict(OrderedDict):
     """Default ordered dictionary"""
@@ -35,13 +37,26 @@ class DefaultOrderedDict(OrderedDict):
     def __repr__(self):
         return 'OrderedDefaultDict(%s, %s)' % (self.default_factory, OrderedDict.__repr__(self))
 
+class SiteArray:
+    """Class to hold the sites of an annotation in a sequence as parallel arrays of begin positions, end positions and, optionally, site names"""
+    def __init__(self, begins = None, ends = None, names = None):
+        self.begins = np.zeros(0, dtype = np.int64) if begins is None else begins
+        self.ends = np.zeros(0, dtype = np.int64) if ends is None else ends
+        self.names = names
+    def __len__(self):
+        return len(self.begins)
+    def to_lists(self):
+        """Method to get the lists of site begin positions, end positions and names (None if the names are not read) for writing the output"""
+        names = [None] * len(self.begins) if self.names is None else self.names.tolist()
+        return self.begins.tolist(), self.ends.tolist(), names
+
 class InputData:
     """Class to hold the mapping and annotation data"""
     def __init__(self):
         self.seq_len = {}
         self.time_series_starts = {}
         self.group_map = DefaultOrderedDict(list)
-        self.sites = (None, defaultdict(lambda: defaultdict(list)), defaultdict(lambda: defaultdict(list)))
+        self.sites = (None, defaultdict(lambda: defaultdict(SiteArray)), defaultdict(lambda: defaultdict(SiteArray)))
 
 class GlobalState:
     """Class to hold the global state of the program"""
@@ -80,58 +95,67 @@ class CurrentSequence:
         self.length = length
         self.sites = sites
 
+def _measure_value_property(idx):
+    """Function to build the property exposing a measure kept in the array of measure values"""
+    def getter(self):
+        return self._values[idx]
+    def setter(self, value):
+        self._values[idx] = value
+    return property(getter, setter)
+
+def _measure_pair_property(array_name, offset):
+    """Function to build the property exposing a per-annotation measure kept in an array, as a view indexed by the annotation number"""
+    return property(lambda self: getattr(self, array_name)[offset: offset + 3])
+
 class BasicMeasures:
     """Class to hold required basic measures for a sequence of a group"""
+    #Names of the measures averaged over the sequence length, of the per-annotation ones and of the per-annotation site counts, which are not averaged
+    scalar_fields = ()
+    pair_fields = ()
+    site_fields = ()
+    def __init_subclass__(cls, **kwargs):
+        super().__init_subclass__(**kwargs)
+        for idx, attr in enumerate(cls.scalar_fields):
+            setattr(cls, attr, _measure_value_property(idx))
+        for idx, attr in enumerate(cls.pair_fields):
+            setattr(cls, attr, _measure_pair_property('_values', len(cls.scalar_fields) + 3 * idx))
+        for idx, attr in enumerate(cls.site_fields):
+            setattr(cls, attr, _measure_pair_property('_counts', 3 * idx))
     def __init__(self):
-        self._attr_list = list(filter(lambda x: not x.startswith('_'), dir(self)))
+        #Measures not calculated stay NaN
+        self._values = np.zeros(len(self.scalar_fields) + 3 * len(self.pair_fields))
+        self._values[: len(self.scalar_fields)] = np.nan
+        self._counts = np.zeros(3 * len(self.site_fields), dtype = np.int64)
+        self.seq_n = None
     def __iadd__(self, other):
-        for attr in self._attr_list:
-            content = getattr(self, attr)
-            if content is None:
-                continue
-            if not isinstance(content, list):
-                setattr(self, attr, content + getattr(other, attr))
-            else:
-                for i in (1, 2):
-                    content[i] += getattr(other, attr)[i]
+        self._values += other._values
+        self._counts += other._counts
         return self
+    def unpack(self):
+        """Method to get the measures as plain Python numbers under the same names, for fast scalar arithmetic"""
+        values = self._values.tolist()
+        counts = self._counts.tolist()
+        offset = len(self.scalar_fields)
+        unpacked = dict(zip(self.scalar_fields, values))
+        for idx, attr in enumerate(self.pair_fields):
+            unpacked[attr] = values[offset + 3 * idx: offset + 3 * idx + 3]
+        for idx, attr in enumerate(self.site_fields):
+            unpacked[attr] = counts[3 * idx: 3 * idx + 3]
+        return SimpleNamespace(seq_n = self.seq_n, **unpacked)
     def __itruediv__(self, seq_length):
-        for attr in self._attr_list:
-            if attr.startswith('s'):
-                continue
-            content = getattr(self, attr)
-            if content is None:
-                continue
-            if not isinstance(content, list):
-                setattr(self, attr, content / seq_length)
-            else:
-                for i in (1, 2):
-                    content[i] /= seq_length
+        self._values /= seq_length
         return self
 
 class BasicBooleanMeasures(BasicMeasures):
     """Class to hold basic Boolean measures for a sequence of a group"""
-    def __init__(self):
-        self.pp = None
-        self.pp_ = [None, 0, 0]
-        self.pa = None
-        self.ap = None
-        self.aa = None
-        self.site_m = [None, 0, 0]
-        self.site_nm = [None, 0, 0]
-        self.site_len = [None, 0, 0]
-        self.seq_n = None
-        BasicMeasures.__init__(self)
+    scalar_fields = ('pp', 'pa', 'ap', 'aa')
+    pair_fields = ('pp_', )
+    site_fields = ('site_m', 'site_nm', 'site_len')
 
 class BasicEnrichmentMeasures(BasicMeasures):
     """Class to hold basic count measures for a sequence of a group"""
-    def __init__(self):
-        self.e = [None, 0, 0]
-        self.ee = None
-        self.ne = None
-        self.re = [None, 0, 0]
-        self.nre = None
-        BasicMeasures.__init__(self)
+    scalar_fields = ('ee', 'ne', 'nre')
+    pair_fields = ('e', 're')
 
 class MeasureType:
     """Class to store the information abour a specific measure displayed in the output"""
@@ -207,7 +231,15 @@ class PerformanceMeasures:
         MeasureFullType('SitePCV', 'site_pcv', 'Site-wise positive correlation value', 'float', mode_Bs = True, mode_Bg = True, mode_Eq = True, mode_Bn = True)
     )
     def __init__(self, enrichment_count, benchmark, gross):
-        self.name_map = []
+        self.name_map, self.attr_names, self.displayed_names, self._index, self._is_int, initial_values = PerformanceMeasures._build_name_lists(bool(enrichment_count), benchmark, gross)
+        #Values of the measures and the numbers of the summed up values, in the order of the name map
+        self._values = initial_values.copy()
+        self._counts = np.zeros(len(self.name_map), dtype = np.int64)
+    @staticmethod
+    @functools.lru_cache(maxsize = None)
+    def _build_name_lists(enrichment_count, benchmark, gross):
+        """Method to select the measures displayed in a given mode, returning the tuples of their types, variable names and displayed names, the indices by the variable names, the flags of integer measures and the initial values"""
+        name_map = []
         for measure in PerformanceMeasures.name_map_full:
             if enrichment_count and (not measure.mode_En):
                 continue
@@ -221,38 +253,76 @@ class PerformanceMeasures:
                 continue
             if (not gross) and (not (measure.mode_Bs or measure.mode_En)):
                 continue
-            self.name_map.append(MeasureType(measure.displayed_name, measure.var_name, measure.description, measure.type_))
-        self._attr_list = []
-        for measure in self.name_map:
-            if enrichment_count:
-                measure.var_name = 'e_' + measure.var_name
-            setattr(self, measure.var_name, [float('nan') if measure.type_ == 'float' else 0, 0])
-            self._attr_list.append(measure.var_name)
+            var_name = 'e_' + measure.var_name if enrichment_count else measure.var_name
+            name_map.append(MeasureType(measure.displayed_name, var_name, measure.description, measure.type_))
+        attr_names = tuple(measure.var_name for measure in name_map)
+        is_int = tuple(measure.type_ != 'float' for measure in name_map)
+        initial_values = np.array([0.0 if is_int_ else np.nan for is_int_ in is_int])
+        return tuple(name_map), attr_names, tuple(measure.displayed_name for measure in name_map), {attr: idx for idx, attr in enumerate(attr_names)}, is_int, initial_values
     def __iadd__(self, other):
-        for attr in self._attr_list:
-            content = getattr(self, attr)
-            content_ = getattr(other, attr)
-            if not math.isnan(content_[0]):
-                if math.isnan(content[0]):
-                    content[0] = content_[0]
-                else:
-                    content[0] += content_[0]
-                content[1] += content_[1]
+        #Measures not calculated in the other instance are skipped, and those not calculated in this one are taken over
+        present = ~np.isnan(other._values)
+        self._values[present] = np.where(np.isnan(self._values[present]), 0.0, self._values[present]) + other._values[present]
+        self._counts[present] += other._counts[present]
+        return self
+    def add_all(self, others):
+        """Method to add up the measures of several instances at once, with the same result as adding them one by one"""
+        if not others:
+            return self
+        #The reductions along the first axis add the rows up in order
+        values = np.vstack([self._values] + [other._values for other in others])
+        present = ~np.isnan(values)
+        self._values = np.where(present.any(axis = 0), np.where(present, values, 0.0).sum(axis = 0), np.nan)
+        self._counts = np.where(present, np.vstack([self._counts] + [other._counts for other in others]), 0).sum(axis = 0)
         return self
     def set_value(self, attr, value):
         """Method to set value of a measure"""
-        getattr(self, attr)[0] = value
-        getattr(self, attr)[1] = 1
+        idx = self._index[attr]
+        self._values[idx] = value
+        self._counts[idx] = 1
+    def iter_values(self):
+        """Method to iterate over the values of all the measures in the order of the name map, with integer measures as integers"""
+        return ((int(value) if is_int else value) for value, is_int in zip(self._values.tolist(), self._is_int))
+    def as_arrays(self):
+        """Method to get the values and the counts of all the measures as arrays in the order of the name map"""
+        return self._values.copy(), self._counts.copy()
     def get_value(self, attr):
         """Method to get value of a measure"""
-        return getattr(self, attr)[0]
+        idx = self._index[attr]
+        value = self._values[idx].item()
+        return int(value) if self._is_int[idx] else value
     def get_count(self, attr):
         """Method to get count for a measure"""
-        return getattr(self, attr)[1]
+        return self._counts[self._index[attr]].item()
 
 class FileHandlers:
     """Class to hold the handlers of the output annotation files"""
     output_file_types = ('union', 'intersection', 'complement1', 'complement2', 're1', 're2', 'detailed', 'site')
     def __init__(self):
         for attr_name in FileHandlers.output_file_types:
-            setattr(self, attr_name, None)
\ No newline at end of file
+            setattr(self, attr_name, None)
+
+class LazyFile:
+    """Class to hold an output file that is opened for writing, together with its header, only when it is first written to or closed"""
+    #Size of the write buffer, large enough for the output of a whole sequence to be passed to the system at once
+    buffer_size = 1 << 20
+    def __init__(self, path, header = ''):
+        self.path = path
+        self.header = header
+        self._file = None
+        #The file is created right away, so that an unwritable path is reported before any processing
+        open(path, 'w').close()
+    def _open(self):
+        """Method to open the file, write the header and redirect further writing directly to the file"""
+        self._file = open(self.path, 'w', buffering = self.buffer_size)
+        self._file.write(self.header)
+        self.write = self._file.write
+    def write(self, text):
+        """Method to open the file and write the first text to it"""
+        self._open()
+        return self._file.write(text)
+    def close(self):
+        """Method to close the file, creating it if nothing has been written to it"""
+        if self._file is None:
+            self._open()
+        self._file.close()